@@ -0,0 +1,257 @@
+import argparse
+import hashlib
+import hmac
+import io
+import json
+import mimetypes
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.httpserver
+import tornado.ioloop
+import tornado.web
+from PIL import UnidentifiedImageError
+
+from hospitals import locations
+from pipeline import (ABUSE_TYPES, ANIMAL_TYPES, CULPRIT_EXTENSIONS, EVIDENCE_EXTENSIONS, register_abuse,
+                      register_injury, resume_analyses, store_upload)
+from scheduler import severity_of
+from storage import claim_idempotency_key, complete_idempotency_key, get_case, release_idempotency_key
+
+PORT = int(os.environ.get("PAWALERT_API_PORT", "8600"))
+MAX_BODY_MB = int(os.environ.get("PAWALERT_API_MAX_MB", "25"))
+WORKERS = int(os.environ.get("PAWALERT_API_WORKERS", "8"))
+# Clients send it as "Authorization: Bearer <token>"; required to listen beyond localhost
+TOKEN = os.environ.get("PAWALERT_API_TOKEN")
+LOOPBACK = ("127.0.0.1", "::1", "localhost")
+MAX_DESCRIPTION = 5000
+
+# Uploads are written, preprocessed and registered here, off the event loop
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="pawalert-api")
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _field(request, name, choices=None, required=True):
+    value = request.body_arguments.get(name, [b""])[0].decode("utf-8", "replace").strip()
+    if required and not value:
+        raise RequestError(400, f"{name} is required")
+    if choices is not None and value not in choices:
+        raise RequestError(422, f"{name} must be one of: {', '.join(choices)}")
+    return value
+
+
+def _file(request, name, extensions, required=True):
+    files = request.files.get(name)
+    if not files:
+        if required:
+            raise RequestError(400, f"{name} file is required")
+        return None
+    upload = files[0]
+    if upload.filename.rsplit(".", 1)[-1].lower() not in extensions:
+        raise RequestError(415, f"{name} must be one of: {', '.join(extensions)}")
+    return upload
+
+
+def parse_report(request, case_type):
+    # Same fields and choices as injury_form and abuse_form
+    report = {
+        "animal_type": _field(request, "animal_type", ANIMAL_TYPES),
+        "location": _field(request, "location", list(locations())),
+        "description": _field(request, "description"),
+        "image": _file(request, "image", EVIDENCE_EXTENSIONS),
+    }
+    if len(report["description"]) > MAX_DESCRIPTION:
+        raise RequestError(413, f"description is longer than {MAX_DESCRIPTION} characters")
+    if case_type == "Abuse":
+        report["abuse_type"] = _field(request, "abuse_type", ABUSE_TYPES)
+        report["culprit"] = _file(request, "culprit", CULPRIT_EXTENSIONS, required=False)
+    return report
+
+
+def fingerprint(case_type, report):
+    # A reused idempotency key must come with the same report
+    digest = hashlib.sha256(case_type.encode())
+    for name in sorted(report):
+        value = report[name]
+        digest.update(b"\0" + name.encode() + b"\0")
+        if value is None:
+            continue
+        digest.update(hashlib.sha256(value.body).digest() if hasattr(value, "body") else value.encode())
+    return digest.hexdigest()
+
+
+def _store(upload, kind):
+    content_type = upload.content_type
+    if not content_type or content_type == "application/octet-stream":
+        content_type = mimetypes.guess_type(upload.filename)[0] or "image/jpeg"
+    return store_upload(io.BytesIO(upload.body), content_type, kind)
+
+
+def register_report(case_type, report):
+    try:
+        evidence = _store(report["image"], "image")
+        if report.get("culprit"):
+            evidence.update(_store(report["culprit"], "culprit"))
+    except (UnidentifiedImageError, ValueError):
+        raise RequestError(422, "could not read the uploaded file; send a clear photo or video")
+    if case_type == "Injury":
+        return register_injury(report["animal_type"], report["location"], report["description"], evidence)
+    return register_abuse(report["animal_type"], report["abuse_type"], report["location"], report["description"],
+                          evidence)
+
+
+def case_body(case_id, linked=False):
+    # Analysis and hospitals fill in as the background job finishes; poll GET /api/cases/<id>
+    case = get_case(case_id)
+    if case["analysis"]:
+        analysis_state = "done"
+    elif case["analysis_error"]:
+        analysis_state = "failed"
+    else:
+        analysis_state = "pending"
+    body = {
+        "case_id": case["id"],
+        "type": case["type"],
+        "status": case["status"],
+        "linked": linked,
+        "timestamp": case["timestamp"],
+        "analysis_state": analysis_state,
+        "analysis": case["analysis"],
+        "severity": severity_of(case["analysis"]),
+        "url": f"/api/cases/{case['id']}",
+    }
+    if case["type"] == "Injury":
+        body["hospitals"] = case["hospitals"]
+    else:
+        body["fir_number"] = case["fir_number"]
+    return body
+
+
+class JSONHandler(tornado.web.RequestHandler):
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+
+    def prepare(self):
+        token = self.settings.get("token")
+        if token and not hmac.compare_digest(self.request.headers.get("Authorization", ""), f"Bearer {token}"):
+            raise tornado.web.HTTPError(401, "missing or wrong API token")
+
+    def run(self, fn, *args):
+        return tornado.ioloop.IOLoop.current().run_in_executor(_executor, fn, *args)
+
+    def write_json(self, status, body):
+        self.set_status(status)
+        self.finish(json.dumps(body))
+
+    def write_error(self, status_code, **kwargs):
+        exc = kwargs.get("exc_info", (None, None))[1]
+        message = exc.log_message if isinstance(exc, tornado.web.HTTPError) and exc.log_message else self._reason
+        self.finish(json.dumps({"error": message}))
+
+
+class ReportHandler(JSONHandler):
+    async def post(self, kind):
+        case_type = "Injury" if kind == "injury" else "Abuse"
+        key = self.request.headers.get("Idempotency-Key", "").strip()
+        try:
+            report = parse_report(self.request, case_type)
+            if key:
+                # Scoped by case type, so the same key can't return an injury case to an abuse report
+                key = f"{case_type}:{key}"
+                digest = await self.run(fingerprint, case_type, report)
+                stored = await self.run(claim_idempotency_key, key, digest)
+                if stored is not None:
+                    return await self._replay(stored, digest)
+            try:
+                case_id, linked = await self.run(register_report, case_type, report)
+            except BaseException:
+                if key:
+                    await self.run(release_idempotency_key, key)
+                raise
+            if key:
+                await self.run(complete_idempotency_key, key, case_id, linked)
+        except RequestError as e:
+            return self.write_json(e.status, {"error": str(e)})
+        body = await self.run(case_body, case_id, linked)
+        self.set_header("Location", body["url"])
+        self.write_json(200 if linked else 201, body)
+
+    async def _replay(self, stored, digest):
+        if stored["fingerprint"] != digest:
+            return self.write_json(422, {"error": "Idempotency-Key was already used for a different report"})
+        if stored["case_id"] is None:
+            self.set_header("Retry-After", "1")
+            return self.write_json(409, {"error": "a request with this Idempotency-Key is still being processed"})
+        self.set_header("Idempotent-Replayed", "true")
+        self.write_json(200, await self.run(case_body, stored["case_id"], bool(stored["linked"])))
+
+
+class NotFoundHandler(JSONHandler):
+    def prepare(self):
+        raise tornado.web.HTTPError(404)
+
+
+class CaseHandler(JSONHandler):
+    async def get(self, case_id):
+        if await self.run(get_case, case_id) is None:
+            return self.write_json(404, {"error": f"no case {case_id}"})
+        self.write_json(200, await self.run(case_body, case_id))
+
+
+class HealthHandler(JSONHandler):
+    def prepare(self):
+        pass
+
+    def get(self):
+        self.write_json(200, {"ok": True})
+
+
+def make_app(token=TOKEN):
+    return tornado.web.Application([
+        (r"/api/reports/(injury|abuse)", ReportHandler),
+        (r"/api/cases/([A-Z]{3}[0-9]+)", CaseHandler),
+        (r"/api/health", HealthHandler),
+    ], default_handler_class=NotFoundHandler, token=token)
+
+
+def server_options(max_body_mb=MAX_BODY_MB):
+    # Oversized requests are refused from the Content-Length header, before the body is read
+    return {"max_body_size": max_body_mb * 1024 * 1024, "max_buffer_size": max_body_mb * 1024 * 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON intake API for injury and abuse reports")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--address", default="127.0.0.1",
+                        help="interface to listen on; anything but localhost needs PAWALERT_API_TOKEN")
+    parser.add_argument("--stub-model", action="store_true",
+                        help="answer with the deterministic benchmark stub instead of calling Groq")
+    args = parser.parse_args()
+    if args.stub_model:
+        import inference
+
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench"))
+        from stub_client import StubClient
+
+        inference._client = StubClient()
+        inference._client_key = "stub"
+    elif not os.environ.get("GROQ_API_KEY"):
+        parser.error("GROQ_API_KEY is not set (or pass --stub-model)")
+    if args.address not in LOOPBACK and not TOKEN:
+        parser.error(f"set PAWALERT_API_TOKEN before listening on {args.address}")
+
+    resume_analyses()
+    server = tornado.httpserver.HTTPServer(make_app(), **server_options())
+    server.listen(args.port, args.address)
+    print(f"PawAlert intake API on http://{args.address}:{args.port}/api", file=sys.stderr)
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from datetime import datetime
-import base64
-from groq import Groq
+from html import escape
 import os
+import time
+from assets import asset_src, asset_srcset, theme_css
+from changefeed import change_feed
+from chat_memory import ChatMemory
+from fleet import get_fleet
+from fragments import fragment_cache
+from hospitals import locations
+from inference import analyze_with_groq, get_client
+from storage import ANALYSIS_CLAIM_SECONDS, count_by_status, count_cases, get_case, list_case_summaries, notify_police
+from jobs import DONE, FAILED, get_job
+from pipeline import (ABUSE_TYPES, ANIMAL_TYPES, CULPRIT_EXTENSIONS, EVIDENCE_EXTENSIONS, blob_base64, chat_category,
+                      close_injury_case, dispatch_case, register_abuse, register_injury, resume_analyses,
+                      start_analysis, start_dispatch_message, start_police_message, store_upload)
+from response_cache import response_cache
+from scheduler import scheduler
+from telemetry import counter_values, latency_summary, span, start_metrics_server
+from PIL import UnidentifiedImageError
 
 # Page config
 st.set_page_config(
@@ -22,177 +39,59 @@ try:
         st.error("GROQ_API_KEY not found!")
         st.stop()
     
-    client = Groq(api_key=GROQ_API_KEY)
+    client = get_client(GROQ_API_KEY)
 except Exception as e:
     st.error(f"Error: {str(e)}")
     st.stop()
 
-# CSS
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;600;700&display=swap');
-    @import url('https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css');
-    * { font-family: 'Poppins', sans-serif; }
-    .main { background: linear-gradient(135deg, #fef5ff 0%, #f9e7ff 100%); }
-    .stButton>button {
-        background: linear-gradient(135deg, #e2a9f1 0%, #d89fe8 100%);
-        color: #4a0e4e; font-weight: 600; border: none; border-radius: 12px;
-        padding: 12px 28px; font-size: 16px; transition: all 0.3s;
-        box-shadow: 0 4px 15px rgba(226, 169, 241, 0.3);
-    }
-    .stButton>button:hover { transform: translateY(-2px); box-shadow: 0 6px 20px rgba(226, 169, 241, 0.5); }
-    h1, h2, h3 { color: #6b1e6f; }
-    .header-container {
-        text-align: center; padding: 20px;
-        background: linear-gradient(135deg, #e2a9f1 0%, #f5d4ff 100%);
-        border-radius: 20px; margin-bottom: 30px;
-        box-shadow: 0 8px 25px rgba(226, 169, 241, 0.4);
-    }
-    .icon-button {
-        background: white; padding: 20px; border-radius: 15px;
-        text-align: center; cursor: pointer; transition: all 0.3s;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.1); border: 3px solid #e2a9f1;
-    }
-    .icon-button:hover { transform: translateY(-5px); box-shadow: 0 8px 25px rgba(226, 169, 241, 0.4); }
-    .case-card {
-        background: white; padding: 25px; border-radius: 15px;
-        border-left: 5px solid #e2a9f1; margin: 15px 0;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-    }
-    .success-box {
-        background: linear-gradient(135deg, #d4f5e9 0%, #a8e6cf 100%);
-        padding: 20px; border-radius: 12px; border-left: 5px solid #4caf50; margin: 20px 0;
-    }
-    .hospital-card {
-        background: white; padding: 20px; border-radius: 12px;
-        margin: 10px 0; border: 2px solid #e2a9f1; transition: all 0.3s;
-    }
-    .hospital-card:hover { transform: translateX(5px); box-shadow: 0 6px 20px rgba(226, 169, 241, 0.3); }
-    .status-badge {
-        display: inline-block; padding: 8px 16px; border-radius: 20px;
-        font-weight: 600; font-size: 14px; background: #e2a9f1; color: #4a0e4e;
-    }
-    .chat-container {
-        background: white; border-radius: 15px; padding: 20px;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.1); margin: 20px 0;
-        max-height: 500px; overflow-y: auto;
-    }
-    .chat-message { padding: 12px 18px; border-radius: 12px; margin: 10px 0; }
-    .user-message { background: #f3e5f5; color: #4a0e4e; margin-left: 20%; }
-    .bot-message { background: #e2a9f1; color: #4a0e4e; margin-right: 20%; }
-    .stTextInput>div>div>input, .stTextArea>div>div>textarea, .stSelectbox>div>div>select {
-        border: 2px solid #e2a9f1; border-radius: 10px; color: #4a0e4e;
-    }
-    label { color: #6b1e6f !important; font-weight: 600 !important; }
-    .stFileUploader { border: 2px dashed #e2a9f1; border-radius: 10px; padding: 10px; }
-    .dispatch-box {
-        background: linear-gradient(135deg, #fff3e0 0%, #ffe0b2 100%);
-        padding: 25px; border-radius: 15px; border-left: 5px solid #ff9800;
-        margin: 20px 0; box-shadow: 0 6px 20px rgba(255, 152, 0, 0.3);
-    }
-    .police-box {
-        background: linear-gradient(135deg, #e3f2fd 0%, #bbdefb 100%);
-        padding: 25px; border-radius: 15px; border-left: 5px solid #2196f3;
-        margin: 20px 0; box-shadow: 0 6px 20px rgba(33, 150, 243, 0.3);
-    }
-    .detail-row {
-        display: flex; justify-content: space-between; padding: 12px 0;
-        border-bottom: 1px solid #e2a9f1;
-    }
-    .detail-label { font-weight: 600; color: #6b1e6f; }
-    .detail-value { color: #4a0e4e; }
-    .image-container {
-        text-align: center; margin: 20px 0;
-        border: 3px solid #e2a9f1; border-radius: 15px;
-        padding: 10px; background: white;
-    }
-
-   .stExpander {
-        background: white !important; 
-        border: 2px solid #e2a9f1 !important; 
-        border-radius: 12px !important;
-        margin: 15px 0 !important; 
-        box-shadow: 0 4px 15px rgba(0,0,0,0.1) !important;
-    }
-    .stExpander summary, .stExpander summary p, .stExpander summary span, 
-    .stExpander summary div, .stExpander [data-testid="stExpanderDetails"] summary {
-        color: #4a0e4e !important; 
-        font-weight: 600 !important;
-        font-size: 16px !important; 
-        padding: 15px !important;
-        background: linear-gradient(135deg, #f9e7ff 0%, #fef5ff 100%) !important;
-        border-radius: 10px !important;
-    }
-    .stExpander:hover summary, .stExpander:hover summary p, 
-    .stExpander:hover summary span, .stExpander:hover summary div {
-        background: linear-gradient(135deg, #e2a9f1 0%, #f5d4ff 100%) !important;
-        color: #2d0a30 !important;
-    }
-    .stExpander[open] summary, .stExpander[open] summary p,
-    .stExpander[open] summary span, .stExpander[open] summary div {
-        background: linear-gradient(135deg, #e2a9f1 0%, #d89fe8 100%) !important;
-        color: #2d0a30 !important;
-        border-bottom: 2px solid #d89fe8 !important;
-    }
-
-    div[data-testid="stExpander"] > details > summary {
-        color: #4a0e4e !important;
-        background: linear-gradient(135deg, #f9e7ff 0%, #fef5ff 100%) !important;
-        font-weight: 600 !important;
-    }
-    div[data-testid="stExpander"] > details > summary:hover {
-        color: #2d0a30 !important;
-        background: linear-gradient(135deg, #e2a9f1 0%, #f5d4ff 100%) !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Metrics are optional; a port already taken (e.g. by another replica) is logged, not fatal
+start_metrics_server()
+# Analyses left unfinished by a restart or a crashed process (once per process)
+resume_analyses()
+
+# Theme: bundled stylesheet, fonts and icons (built by assets.py)
+st.markdown(theme_css(), unsafe_allow_html=True)
 
 # Session state
-if 'cases' not in st.session_state:
-    st.session_state.cases = []
 if 'current_page' not in st.session_state:
     st.session_state.current_page = 'home'
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+if 'chat_memory' not in st.session_state:
+    st.session_state.chat_memory = ChatMemory()
 if 'current_case_id' not in st.session_state:
     st.session_state.current_case_id = None
 if 'processing_complete' not in st.session_state:
     st.session_state.processing_complete = False
-
-def encode_image(image_file):
-    return base64.b64encode(image_file.getvalue()).decode('utf-8')
-
-def analyze_with_groq(prompt, image_data=None):
-    try:
-        if image_data:
-            response = client.chat.completions.create(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}"}}
-                    ]
-                }],
-                max_tokens=1000
-            )
-        else:
-            response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=1000
-            )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Analysis error: {str(e)}"
+if 'status_page_num' not in st.session_state:
+    st.session_state.status_page_num = 0
+if 'open_case_id' not in st.session_state:
+    st.session_state.open_case_id = None
+if 'linked_report' not in st.session_state:
+    st.session_state.linked_report = False
+
+CASES_PER_PAGE = 10
+ADMIN_ENABLED = os.environ.get("PAWALERT_ADMIN") == "1"
+CHAT_DISPLAY_LIMIT = 30
+LIVE_REFRESH_SECONDS = 0.5
+
+def esc(value):
+    # Case fields and model replies are shown to every dispatcher; only the fixed markup is raw HTML
+    return escape(str(value))
+
+def evidence_data_uri(sha):
+    if not sha:
+        return None
+    return f"data:image/jpeg;base64,{blob_base64(sha)}"
+
+def cached_html(case, name, build):
+    # Served from the fragment cache until the case version changes
+    st.markdown(fragment_cache.render(case, name, build), unsafe_allow_html=True)
 
 def show_header():
     try:
-        with open("logo.png", "rb") as f:
-            logo_data = base64.b64encode(f.read()).decode()
+        logo_src = asset_src("logo", 240)
         st.markdown(f"""
         <div class="header-container">
-            <img src="data:image/png;base64,{logo_data}" width="120" style="margin-bottom: 15px; border-radius: 50%;">
+            <img src="{logo_src}" width="120" style="margin-bottom: 15px; border-radius: 50%;">
             <h1 style="margin: 10px 0; color: #4a0e4e;"><i class="fas fa-paw"></i> PawAlert</h1>
             <p style="color: #6b1e6f; font-size: 18px;">Animal Welfare & Rescue Platform</p>
         </div>
@@ -205,20 +104,121 @@ def show_header():
         </div>
         """, unsafe_allow_html=True)
 
+def linked_report_notice(case):
+    if st.session_state.linked_report:
+        st.info(f"This incident was already reported nearby. Your report has been added to case {esc(case['id'])} as a witness report.")
+    elif case['linked_reports']:
+        st.info(f"{esc(case['linked_reports'])} more witness report(s) linked to this case.")
+
 def navigate_to(page):
     st.session_state.current_page = page
     st.session_state.processing_complete = False
     st.rerun()
 
+def analysis_card(text, icon):
+    return f"""
+<div class='case-card'>
+    <h3 style='color: #6b1e6f;'><i class='fas {icon}'></i> AI Analysis</h3>
+    <div style='color: #4a0e4e; line-height: 1.8; white-space: pre-wrap;'>{esc(text)}</div>
+</div>
+"""
+
+def dispatch_card(text):
+    return f"""
+<div class='case-card' style='background: #fff8e1;'>
+    <h3 style='color: #f57c00;'><i class='fas fa-hand-holding-heart'></i> What To Do Now</h3>
+    <div style='color: #4a0e4e; line-height: 1.8; white-space: pre-wrap;'>{esc(text)}</div>
+</div>
+"""
+
+def police_card(text):
+    return f"""
+<div class='case-card' style='background: #e8f5e9;'>
+    <h3 style='color: #2e7d32;'><i class='fas fa-info-circle'></i> Police Action Details</h3>
+    <div style='color: #4a0e4e; line-height: 1.8; white-space: pre-wrap;'>{esc(text)}</div>
+</div>
+"""
+
+def chat_bubble(role, text):
+    if role == "assistant":
+        return f"""
+            <div class="chat-message bot-message">
+                <strong><i class="fas fa-robot"></i> AI Sathi:</strong><br/>
+                {esc(text)}
+            </div>
+            """
+    return f"""
+            <div class="chat-message user-message">
+                <strong><i class="fas fa-user"></i> You:</strong><br/>
+                {esc(text)}
+            </div>
+            """
+
+def rerun_fragment():
+    # A click inside a fragment normally reruns just that fragment; if it was picked up by a
+    # full run instead, Streamlit only allows rerunning the whole app
+    if get_script_run_ctx().fragment_ids_this_run:
+        st.rerun(scope="fragment")
+    st.rerun()
+
+def show_ai_text(case, field, card, start, waiting_text):
+    # Stored text renders from the fragment cache; otherwise attach to the case's background job (starting it if needed)
+    if case[field]:
+        cached_html(case, field, lambda: card(case[field]))
+        return
+    job = start(case['id'])
+    if job is None:
+        remote_ai_text(case['id'], field, card, waiting_text)
+    elif job.state == DONE:
+        st.markdown(card(job.result), unsafe_allow_html=True)
+    elif job.state == FAILED:
+        st.markdown(card(f"The AI response failed: {job.error}"), unsafe_allow_html=True)
+        if st.button("Retry", key=f"retry_{job.key}"):
+            start(case['id'], retry=True)
+            st.rerun()
+    else:
+        live_ai_text(job.key, card, waiting_text)
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_ai_text(job_key, card, waiting_text):
+    # Only this card refreshes while the job streams; once it finishes the page reruns to pick up
+    # the stored text and anything waiting on it (e.g. hospitals after the analysis)
+    job = get_job(job_key)
+    if job is None or not job.pending:
+        st.rerun()
+    st.markdown(card((job.partial or waiting_text) + "▌"), unsafe_allow_html=True)
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def remote_ai_text(case_id, field, card, waiting_text):
+    # Another process is running this job; the page reruns once it stores a result or an error,
+    # or its claim lapses and this session can take the job over
+    case = get_case(case_id)
+    if (case[field] or case['analysis_error'] or case['analysis_owner'] is None
+            or time.time() - case['analysis_claimed_at'] > ANALYSIS_CLAIM_SECONDS):
+        st.rerun()
+    st.markdown(card(waiting_text + "▌"), unsafe_allow_html=True)
+
+def render_stream(placeholder, card, chunks, interval=0.05):
+    # Redraw the card as tokens arrive, throttled so long replies don't flood the websocket
+    text = ""
+    last_draw = 0.0
+    for chunk in chunks:
+        text += chunk
+        if time.monotonic() - last_draw >= interval:
+            placeholder.markdown(card(text + "▌"), unsafe_allow_html=True)
+            last_draw = time.monotonic()
+    placeholder.markdown(card(text), unsafe_allow_html=True)
+    return text
+
 def home_page():
     show_header()
     
     try:
-        with open("main.png", "rb") as f:
-            main_img = base64.b64encode(f.read()).decode()
+        hero_src = asset_src("hero", 1200)
+        hero_srcset = asset_srcset("hero", (600, 1200))
         st.markdown(f"""
         <div style="text-align: center; margin: 30px 0;">
-            <img src="data:image/png;base64,{main_img}" style="max-width: 600px; width: 100%; border-radius: 20px; box-shadow: 0 8px 25px rgba(0,0,0,0.15);">
+            <img src="{hero_src}" srcset="{hero_srcset}" sizes="(max-width: 640px) 100vw, 600px" style="max-width: 600px; width: 100%; border-radius: 20px; box-shadow: 0 8px 25px rgba(0,0,0,0.15);">
         </div>
         """, unsafe_allow_html=True)
     except:
@@ -261,7 +261,7 @@ def home_page():
         <div class="icon-button">
             <i class="fas fa-clipboard-list" style="font-size: 48px; color: #e2a9f1; margin-bottom: 15px;"></i>
             <h3 style="color: #6b1e6f; margin: 10px 0;">Case Status</h3>
-            <p style="color: #8e44ad;">{len(st.session_state.cases)} cases reported</p>
+            <p style="color: #8e44ad;">{count_cases()} cases reported</p>
         </div>
         """, unsafe_allow_html=True)
         if st.button("Check Status", key="status_btn", use_container_width=True):
@@ -277,6 +277,101 @@ def home_page():
         """, unsafe_allow_html=True)
         if st.button("Chat Now", key="chat_btn", use_container_width=True):
             navigate_to('chat')
+    
+    if ADMIN_ENABLED:
+        if st.button("Admin: Metrics", key="admin_btn"):
+            navigate_to('admin')
+
+@st.fragment
+def ambulance_panel(case_id):
+    # Hospital picker, then the dispatch details; its buttons rerun only this panel
+    current_case = get_case(case_id)
+    if current_case.get('selected_hospital'):
+        hospital = current_case['selected_hospital']
+        eta_text = f"{esc(current_case['eta_minutes'])} minutes" if current_case['eta_minutes'] else "Shortly"
+
+        cached_html(current_case, "dispatch", lambda: f"""
+        <div class="dispatch-box">
+            <h2 style="color: #e65100; margin-top: 0;"><i class="fas fa-ambulance"></i> Ambulance Dispatched!</h2>
+            <div class="detail-row">
+                <span class="detail-label">Hospital:</span>
+                <span class="detail-value">{esc(hospital['name'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Speciality:</span>
+                <span class="detail-value">{esc(hospital['speciality'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Hospital Contact:</span>
+                <span class="detail-value">{esc(hospital['contact'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Expected Fees:</span>
+                <span class="detail-value">{esc(hospital['fees'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Location:</span>
+                <span class="detail-value">{esc(hospital['location'])}</span>
+            </div>
+            <hr style="border: 1px solid #ff9800; margin: 15px 0;">
+            <div class="detail-row">
+                <span class="detail-label">Driver:</span>
+                <span class="detail-value">{esc(current_case['driver_name'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Driver Contact:</span>
+                <span class="detail-value">{esc(current_case['driver_contact'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Estimated Arrival:</span>
+                <span class="detail-value">{esc(eta_text)}</span>
+            </div>
+        </div>
+        """)
+
+        show_ai_text(current_case, 'dispatch_message', dispatch_card, start_dispatch_message,
+                     "Getting ambulance details...")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("Check Detailed Status", use_container_width=True):
+                navigate_to('status')
+        with col2:
+            if st.button("Ask AI Anything", use_container_width=True):
+                navigate_to('chat')
+        with col3:
+            if current_case['status'] != "Case Closed":
+                if st.button("Animal Reached Hospital", use_container_width=True):
+                    close_injury_case(current_case['id'])
+                    rerun_fragment()
+    else:
+        st.markdown("<h3 style='color: #6b1e6f;'><i class='fas fa-hospital'></i> Recommended Hospitals</h3>", unsafe_allow_html=True)
+
+        if not current_case['hospitals']:
+            if current_case['analysis'] is None:
+                st.info("Finding the nearest hospitals equipped for this injury...")
+            else:
+                st.warning("No open hospitals found near this location.")
+
+        for i, hospital in enumerate(current_case['hospitals']):
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                cached_html(current_case, f"hospital:{i}", lambda: f"""
+                <div class="hospital-card">
+                    <h4 style="color: #6b1e6f; margin-top: 0;">{esc(hospital['name'])}</h4>
+                    <p style="color: #8e44ad; margin: 5px 0;"><strong>Speciality:</strong> {esc(hospital['speciality'])}</p>
+                    <p style="color: #8e44ad; margin: 5px 0;"><strong>Contact:</strong> {esc(hospital['contact'])}</p>
+                    <p style="color: #8e44ad; margin: 5px 0;"><strong>Fees:</strong> {esc(hospital['fees'])}</p>
+                    <p style="color: #8e44ad; margin: 5px 0;"><strong>Distance:</strong> {esc(hospital['location'])}</p>
+                    <span class="status-badge">{esc(hospital['availability'])}</span>
+                </div>
+                """)
+            with col2:
+                if st.button("Call Ambulance", key=f"amb_{i}"):
+                    if dispatch_case(current_case['id'], hospital['id']) is None:
+                        st.error("No ambulance is free near this location right now. Please call the hospital directly.")
+                    else:
+                        rerun_fragment()
 
 def injury_page():
     show_header()
@@ -286,126 +381,28 @@ def injury_page():
     
     st.markdown("<h2 style='color: #6b1e6f;'><i class='fas fa-ambulance'></i> Report Animal Injury</h2>", unsafe_allow_html=True)
     
-    if st.session_state.processing_complete and len(st.session_state.cases) > 0:
-        current_case = st.session_state.cases[-1]
+    current_case = get_case(st.session_state.current_case_id) if st.session_state.processing_complete else None
+    if current_case:
         
-        st.markdown(f"""
+        cached_html(current_case, "registered", lambda: f"""
         <div class="success-box">
             <h3 style="color: #2e7d32; margin-top: 0;"><i class="fas fa-check-circle"></i> Case Registered!</h3>
-            <p style="color: #1b5e20; font-size: 18px;"><strong>Case ID: {current_case['id']}</strong></p>
-            <p style="color: #2e7d32;">Timestamp: {current_case['timestamp']}</p>
+            <p style="color: #1b5e20; font-size: 18px;"><strong>Case ID: {esc(current_case['id'])}</strong></p>
+            <p style="color: #2e7d32;">Timestamp: {esc(current_case['timestamp'])}</p>
         </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown(f"""
-                  <div class='case-card'>
-    <h3 style='color: #6b1e6f;'><i class='fas fa-notes-medical'></i> AI Analysis</h3>
-    <div style='color: #4a0e4e; line-height: 1.8; white-space: pre-wrap;'>{current_case['analysis']}</div>
-</div>
-""", unsafe_allow_html=True)
+        """)
+        linked_report_notice(current_case)
         
+        show_ai_text(current_case, 'analysis', lambda text: analysis_card(text, 'fa-notes-medical'),
+                     start_analysis, "Analyzing with AI...")
         
-        if current_case.get('selected_hospital'):
-            hospital = current_case['selected_hospital']
-            
-            if 'dispatch_message' in current_case:
-                st.markdown(f"""
-                <div class="dispatch-box">
-                    <h2 style="color: #e65100; margin-top: 0;"><i class="fas fa-ambulance"></i> Ambulance Dispatched!</h2>
-                    <div class="detail-row">
-                        <span class="detail-label">Hospital:</span>
-                        <span class="detail-value">{hospital['name']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Speciality:</span>
-                        <span class="detail-value">{hospital['speciality']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Hospital Contact:</span>
-                        <span class="detail-value">{hospital['contact']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Expected Fees:</span>
-                        <span class="detail-value">{hospital['fees']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Location:</span>
-                        <span class="detail-value">{hospital['location']}</span>
-                    </div>
-                    <hr style="border: 1px solid #ff9800; margin: 15px 0;">
-                    <div class="detail-row">
-                        <span class="detail-label">Driver:</span>
-                        <span class="detail-value">{current_case['driver_name']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Driver Contact:</span>
-                        <span class="detail-value">{current_case['driver_contact']}</span>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                st.markdown(f"""
-<div class='case-card' style='background: #fff8e1;'>
-    <h3 style='color: #f57c00;'><i class='fas fa-hand-holding-heart'></i> What To Do Now</h3>
-    <div style='color: #4a0e4e; line-height: 1.8; white-space: pre-wrap;'>{current_case['dispatch_message']}</div>
-</div>
-""", unsafe_allow_html=True)
-               
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("Check Detailed Status", use_container_width=True):
-                        navigate_to('status')
-                with col2:
-                    if st.button("Ask AI Anything", use_container_width=True):
-                        navigate_to('chat')
-            else:
-                dispatch_prompt = f"""You are a compassionate emergency dispatcher for animal rescue. An ambulance has been dispatched for an injured {current_case['animal_type']}.
-
-Hospital: {hospital['name']}
-Location: {current_case['location']}
-Driver: {current_case['driver_name']}
-Contact: {current_case['driver_contact']}
-Injury: {current_case['description']}
-
-Provide actionable guidance:
-1. Help is arriving in 5-15 minutes
-2. What to do RIGHT NOW to reduce pain
-3. What NOT to do
-4. Reassurance
-
-Use bullet points."""
-                
-                with st.spinner("Getting ambulance details..."):
-                    dispatch_message = analyze_with_groq(dispatch_prompt)
-                    current_case['dispatch_message'] = dispatch_message
-                    st.rerun()
-        else:
-            st.markdown("<h3 style='color: #6b1e6f;'><i class='fas fa-hospital'></i> Recommended Hospitals</h3>", unsafe_allow_html=True)
-            
-            for i, hospital in enumerate(current_case['hospitals']):
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.markdown(f"""
-                    <div class="hospital-card">
-                        <h4 style="color: #6b1e6f; margin-top: 0;">{hospital['name']}</h4>
-                        <p style="color: #8e44ad; margin: 5px 0;"><strong>Speciality:</strong> {hospital['speciality']}</p>
-                        <p style="color: #8e44ad; margin: 5px 0;"><strong>Contact:</strong> {hospital['contact']}</p>
-                        <p style="color: #8e44ad; margin: 5px 0;"><strong>Fees:</strong> {hospital['fees']}</p>
-                        <span class="status-badge">{hospital['availability']}</span>
-                    </div>
-                    """, unsafe_allow_html=True)
-                with col2:
-                    if st.button("Call Ambulance", key=f"amb_{i}"):
-                        current_case['selected_hospital'] = hospital
-                        current_case['status'] = 'Ambulance Dispatched'
-                        st.rerun()
+        ambulance_panel(current_case['id'])
     else:
         with st.form("injury_form"):
-            animal_type = st.selectbox("Animal Type", ["Dog", "Cat", "Cow", "Horse", "Bird", "Buffalo", "Goat", "Other"])
-            location = st.selectbox("Location", ["Connaught Place, Delhi", "MG Road, Bangalore", "Marine Drive, Mumbai"])
+            animal_type = st.selectbox("Animal Type", ANIMAL_TYPES)
+            location = st.selectbox("Location", list(locations()))
             description = st.text_area("Description of Injury", placeholder="Please describe the injury in detail...")
-            uploaded_file = st.file_uploader("Upload Image/Video of Injured Animal", type=['jpg', 'jpeg', 'png', 'mp4', 'mov'])
+            uploaded_file = st.file_uploader("Upload Image/Video of Injured Animal", type=list(EVIDENCE_EXTENSIONS))
             
             submit = st.form_submit_button("Submit Report", use_container_width=True)
             
@@ -415,48 +412,68 @@ Use bullet points."""
                 elif not uploaded_file:
                     st.error("Please upload an image!")
                 else:
-                    with st.spinner("Analyzing with AI..."):
-                        image_data = encode_image(uploaded_file)
-                        prompt = f"""Analyze this animal injury. Animal: {animal_type}, Location: {location}, Description: {description}
-
-Provide:
-1. Severity Level (Minor/Moderate/Severe/Critical)
-2. Visible Injuries
-3. Immediate Care Required
-4. Recovery Time
-
-Be concise and professional."""
-                        
-                        analysis = analyze_with_groq(prompt, image_data)
+                    with st.spinner("Registering case..."):
+                        try:
+                            evidence = store_upload(uploaded_file, uploaded_file.type, "image")
+                        except (UnidentifiedImageError, ValueError):
+                            st.error("Could not read the uploaded file. Please upload a clear photo or video.")
+                            st.stop()
                         
-                        hospitals = [
-                            {"name": "PetCare Emergency Hospital", "location": location, "availability": "Available Now", 
-                             "contact": "+91 98765-43210", "fees": "₹2,000 - ₹5,000", "speciality": "Emergency & Critical Care"},
-                            {"name": "Animal Rescue Veterinary Clinic", "location": location, "availability": "Available in 15 mins", 
-                             "contact": "+91 98765-43211", "fees": "₹1,500 - ₹4,000", "speciality": "General Treatment"},
-                            {"name": "24/7 Animal Care Center", "location": location, "availability": "Available Now", 
-                             "contact": "+91 98765-43212", "fees": "₹2,500 - ₹6,000", "speciality": "Surgery & ICU"}
-                        ]
-                        
-                        case_id = f"INJ{len(st.session_state.cases) + 1001}"
-                        case = {
-                            "id": case_id, "type": "Injury", "animal_type": animal_type,
-                            "location": location, "description": description,
-                            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "analysis": analysis, "hospitals": hospitals,
-                            "driver_name": "Rajesh Kumar", "driver_contact": "+91 98765-11111",
-                            "selected_hospital": None, "status": "Case Registered",
-                            "image_data": image_data
-                        }
-                        
-                        st.session_state.cases.append(case)
+                        case_id, linked = register_injury(animal_type, location, description, evidence)
                         st.session_state.current_case_id = case_id
+                        st.session_state.linked_report = linked
                         st.session_state.processing_complete = True
                         st.rerun()
 
+@st.fragment
+def police_panel(case_id):
+    # FIR filing and the police response; its buttons rerun only this panel
+    current_case = get_case(case_id)
+    if current_case.get('police_notified'):
+        cached_html(current_case, "police", lambda: f"""
+        <div class="police-box">
+            <h2 style="color: #1565c0; margin-top: 0;"><i class="fas fa-shield-alt"></i> Police Notified - FIR Filed</h2>
+            <div class="detail-row">
+                <span class="detail-label">Case ID:</span>
+                <span class="detail-value">{esc(current_case['id'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">FIR Number:</span>
+                <span class="detail-value">{esc(current_case['fir_number'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Location:</span>
+                <span class="detail-value">{esc(current_case['location'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Abuse Type:</span>
+                <span class="detail-value">{esc(current_case['abuse_type'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Filed At:</span>
+                <span class="detail-value">{esc(current_case['timestamp'])}</span>
+            </div>
+        </div>
+        """)
 
+        show_ai_text(current_case, 'police_message', police_card, start_police_message,
+                     "Getting police dispatch details...")
 
+        if current_case.get('police_message'):
+            st.balloons()
 
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Check Detailed Status", use_container_width=True):
+                navigate_to('status')
+        with col2:
+            if st.button("Ask AI Anything", use_container_width=True):
+                navigate_to('chat')
+    else:
+        if st.button("Notify Police & File FIR", use_container_width=True):
+            notify_police(current_case['id'], datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            start_police_message(current_case['id'])
+            rerun_fragment()
 
 def abuse_page():
     show_header()
@@ -466,108 +483,31 @@ def abuse_page():
     
     st.markdown("<h2 style='color: #6b1e6f;'><i class='fas fa-shield-alt'></i> Report Animal Abuse</h2>", unsafe_allow_html=True)
     
-    if st.session_state.processing_complete and len(st.session_state.cases) > 0:
-        current_case = st.session_state.cases[-1]
+    current_case = get_case(st.session_state.current_case_id) if st.session_state.processing_complete else None
+    if current_case:
         
-        st.markdown(f"""
+        cached_html(current_case, "registered", lambda: f"""
         <div class="success-box">
             <h3 style="color: #2e7d32; margin-top: 0;"><i class="fas fa-check-circle"></i> Abuse Case Registered!</h3>
-            <p style="color: #1b5e20; font-size: 18px;"><strong>Case ID: {current_case['id']}</strong></p>
-            <p style="color: #2e7d32;">Timestamp: {current_case['timestamp']}</p>
-            <p style="color: #2e7d32;">Culprit Photo: {current_case['culprit_photo']}</p>
+            <p style="color: #1b5e20; font-size: 18px;"><strong>Case ID: {esc(current_case['id'])}</strong></p>
+            <p style="color: #2e7d32;">Timestamp: {esc(current_case['timestamp'])}</p>
+            <p style="color: #2e7d32;">Culprit Photo: {esc(current_case['culprit_photo'])}</p>
         </div>
-        """, unsafe_allow_html=True)
+        """)
+        linked_report_notice(current_case)
         
-        st.markdown(f"""
-<div class='case-card'>
-    <h3 style='color: #6b1e6f;'><i class='fas fa-gavel'></i> AI Analysis</h3>
-    <div style='color: #4a0e4e; line-height: 1.8; white-space: pre-wrap;'>{current_case['analysis']}</div>
-</div>
-""", unsafe_allow_html=True)
-      
+        show_ai_text(current_case, 'analysis', lambda text: analysis_card(text, 'fa-gavel'),
+                     start_analysis, "Analyzing with AI...")
         
-        if current_case.get('police_notified'):
-            if 'police_message' in current_case:
-                st.markdown(f"""
-                <div class="police-box">
-                    <h2 style="color: #1565c0; margin-top: 0;"><i class="fas fa-shield-alt"></i> Police Notified - FIR Filed</h2>
-                    <div class="detail-row">
-                        <span class="detail-label">Case ID:</span>
-                        <span class="detail-value">{current_case['id']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">FIR Number:</span>
-                        <span class="detail-value">{current_case['fir_number']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Location:</span>
-                        <span class="detail-value">{current_case['location']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Abuse Type:</span>
-                        <span class="detail-value">{current_case['abuse_type']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Filed At:</span>
-                        <span class="detail-value">{current_case['timestamp']}</span>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                st.markdown(f"""
-<div class='case-card' style='background: #e8f5e9;'>
-    <h3 style='color: #2e7d32;'><i class='fas fa-info-circle'></i> Police Action Details</h3>
-    <div style='color: #4a0e4e; line-height: 1.8; white-space: pre-wrap;'>{current_case['police_message']}</div>
-</div>
-""", unsafe_allow_html=True)
-               
-                
-                st.balloons()
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("Check Detailed Status", use_container_width=True):
-                        navigate_to('status')
-                with col2:
-                    if st.button("Ask AI Anything", use_container_width=True):
-                        navigate_to('chat')
-            else:
-                police_prompt = f"""You are a police dispatcher handling animal abuse. Case registered.
-
-Case ID: {current_case['id']}
-FIR: {current_case['fir_number']}
-Animal: {current_case['animal_type']}
-Abuse: {current_case['abuse_type']}
-Location: {current_case['location']}
-Description: {current_case['description']}
-
-Provide:
-1. Police notified, FIR filed confirmation
-2. Team arrival time (10-20 minutes)
-3. Immediate actions being taken
-4. What reporter should do (preserve evidence, ensure safety)
-5. Legal process next steps
-6. Reassurance
-
-Use bullet points."""
-                
-                with st.spinner("Getting police dispatch details..."):
-                    police_message = analyze_with_groq(police_prompt)
-                    current_case['police_message'] = police_message
-                    st.rerun()
-        else:
-            if st.button("Notify Police & File FIR", use_container_width=True):
-                current_case['police_notified'] = True
-                current_case['status'] = 'Police Notified - FIR Filed'
-                st.rerun()
+        police_panel(current_case['id'])
     else:
         with st.form("abuse_form"):
-            animal_type = st.selectbox("Animal Type", ["Dog", "Cat", "Cow", "Horse", "Bird", "Buffalo", "Goat", "Other"])
-            abuse_type = st.selectbox("Type of Abuse", ["Physical Abuse", "Neglect", "Abandonment", "Cruelty", "Illegal Trade", "Torture", "Illegal Slaughter", "Other"])
-            location = st.selectbox("Location", ["Connaught Place, Delhi", "MG Road, Bangalore", "Marine Drive, Mumbai"])
+            animal_type = st.selectbox("Animal Type", ANIMAL_TYPES)
+            abuse_type = st.selectbox("Type of Abuse", ABUSE_TYPES)
+            location = st.selectbox("Location", list(locations()))
             description = st.text_area("Description of Incident", placeholder="Please provide detailed information...")
-            incident_file = st.file_uploader("Upload Image/Video of Incident", type=['jpg', 'jpeg', 'png', 'mp4', 'mov'])
-            culprit_file = st.file_uploader("Upload Photo of Culprit (Optional)", type=['jpg', 'jpeg', 'png'])
+            incident_file = st.file_uploader("Upload Image/Video of Incident", type=list(EVIDENCE_EXTENSIONS))
+            culprit_file = st.file_uploader("Upload Photo of Culprit (Optional)", type=list(CULPRIT_EXTENSIONS))
             
             submit = st.form_submit_button("Submit Abuse Report", use_container_width=True)
             
@@ -577,51 +517,208 @@ Use bullet points."""
                 elif not incident_file:
                     st.error("Please upload an image!")
                 else:
-                    with st.spinner("Processing with AI..."):
-                        image_data = encode_image(incident_file)
-                        culprit_data = encode_image(culprit_file) if culprit_file else None
-                        
-                        prompt = f"""Analyze this animal abuse case. Animal: {animal_type}, Abuse: {abuse_type}, Location: {location}, Description: {description}
-
-Provide:
-1. Severity Assessment
-2. Immediate Action Needed
-3. Legal Recommendations
-4. Animal Care Suggestions
-
-Be concise and actionable."""
-                        
-                        analysis = analyze_with_groq(prompt, image_data)
-                        
-                        case_id = f"ABU{len(st.session_state.cases) + 2001}"
-                        fir_number = f"FIR/{datetime.now().year}/ANM/{len(st.session_state.cases) + 5001}"
-                        
-                        case = {
-                            "id": case_id, "type": "Abuse", "animal_type": animal_type,
-                            "abuse_type": abuse_type, "location": location, "description": description,
-                            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "analysis": analysis, "culprit_photo": "Provided" if culprit_file else "Not Provided",
-                            "fir_number": fir_number, "police_notified": False, "status": "Case Registered",
-                            "image_data": image_data, "culprit_data": culprit_data
-                        }
+                    with st.spinner("Registering case..."):
+                        try:
+                            evidence = store_upload(incident_file, incident_file.type, "image")
+                            if culprit_file:
+                                evidence.update(store_upload(culprit_file, culprit_file.type, "culprit"))
+                        except (UnidentifiedImageError, ValueError):
+                            st.error("Could not read the uploaded file. Please upload a clear photo or video.")
+                            st.stop()
                         
-                        st.session_state.cases.append(case)
+                        case_id, linked = register_abuse(animal_type, abuse_type, location, description, evidence)
                         st.session_state.current_case_id = case_id
+                        st.session_state.linked_report = linked
                         st.session_state.processing_complete = True
                         st.rerun()
 
+def image_container(title, sha):
+    return f"""
+        <div class="image-container">
+            <h4 style="color: #6b1e6f; margin-top: 0;">{title}</h4>
+            <img src="{evidence_data_uri(sha)}" style="max-width: 100%; max-height: 400px; border-radius: 10px;">
+        </div>
+        """
+
+def case_details(case):
+    image_sha = case['evidence'].get('image_thumb')
+    culprit_sha = case['evidence'].get('culprit_thumb')
+    if case['type'] == 'Abuse' and culprit_sha:
+        col1, col2 = st.columns(2)
+        with col1:
+            cached_html(case, "details:image", lambda: image_container("Animal/Incident", image_sha))
+        with col2:
+            cached_html(case, "details:culprit", lambda: image_container("Culprit", culprit_sha))
+    elif image_sha:
+        cached_html(case, "details:image", lambda: image_container("Animal Image", image_sha))
+
+    cached_html(case, "details:info", lambda: f"""
+    <div class="case-card">
+        <h3 style="color: #6b1e6f;"><i class="fas fa-info-circle"></i> Case Information</h3>
+        <div class="detail-row">
+            <span class="detail-label">Case ID:</span>
+            <span class="detail-value">{esc(case['id'])}</span>
+        </div>
+        <div class="detail-row">
+            <span class="detail-label">Type:</span>
+            <span class="detail-value">{esc(case['type'])}</span>
+        </div>
+        <div class="detail-row">
+            <span class="detail-label">Animal:</span>
+            <span class="detail-value">{esc(case['animal_type'])}</span>
+        </div>
+        <div class="detail-row">
+            <span class="detail-label">Location:</span>
+            <span class="detail-value">{esc(case['location'])}</span>
+        </div>
+        <div class="detail-row">
+            <span class="detail-label">Timestamp:</span>
+            <span class="detail-value">{esc(case['timestamp'])}</span>
+        </div>
+        <div class="detail-row">
+            <span class="detail-label">Status:</span>
+            <span class="detail-value"><span class="status-badge">{esc(case['status'])}</span></span>
+        </div>
+        <div style="margin-top: 15px; padding-top: 15px; border-top: 1px solid #e2a9f1;">
+            <span class="detail-label">Description:</span>
+            <p style="color: #4a0e4e; margin-top: 8px; line-height: 1.6;">{esc(case['description'])}</p>
+        </div>
+    </div>
+    """)
+
+    if case['type'] == 'Injury' and case.get('selected_hospital'):
+        hospital = case['selected_hospital']
+        cached_html(case, "details:dispatch", lambda: f"""
+        <div class="dispatch-box">
+            <h3 style="color: #e65100; margin-top: 0;"><i class="fas fa-ambulance"></i> Ambulance & Hospital</h3>
+            <div class="detail-row">
+                <span class="detail-label">Hospital:</span>
+                <span class="detail-value">{esc(hospital['name'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Speciality:</span>
+                <span class="detail-value">{esc(hospital['speciality'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Contact:</span>
+                <span class="detail-value">{esc(hospital['contact'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Fees:</span>
+                <span class="detail-value">{esc(hospital['fees'])}</span>
+            </div>
+            <hr style="border: 1px solid #ff9800; margin: 15px 0;">
+            <div class="detail-row">
+                <span class="detail-label">Driver:</span>
+                <span class="detail-value">{esc(case['driver_name'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Contact:</span>
+                <span class="detail-value">{esc(case['driver_contact'])}</span>
+            </div>
+        </div>
+        """)
+
+    if case['type'] == 'Abuse':
+        cached_html(case, "details:abuse", lambda: f"""
+        <div class="case-card" style="background: #fff8e1;">
+            <h3 style="color: #f57c00;"><i class="fas fa-exclamation-triangle"></i> Abuse Details</h3>
+            <div class="detail-row">
+                <span class="detail-label">Abuse Type:</span>
+                <span class="detail-value">{esc(case['abuse_type'])}</span>
+            </div>
+            <div class="detail-row">
+                <span class="detail-label">Culprit Photo:</span>
+                <span class="detail-value">{esc(case['culprit_photo'])}</span>
+            </div>
+        </div>
+        """)
+
+        if case.get('police_notified'):
+            cached_html(case, "details:police", lambda: f"""
+            <div class="police-box">
+                <h3 style="color: #1565c0; margin-top: 0;"><i class="fas fa-shield-alt"></i> Police Status</h3>
+                <div class="detail-row">
+                    <span class="detail-label">FIR:</span>
+                    <span class="detail-value">{esc(case['fir_number'])}</span>
+                </div>
+                <div class="detail-row">
+                    <span class="detail-label">Status:</span>
+                    <span class="detail-value">Notified & FIR Filed</span>
+                </div>
+            </div>
+            """)
+
+    analysis = case['analysis'] or (f"Analysis failed: {case['analysis_error']}" if case['analysis_error']
+                                    else 'Analysis in progress...')
+    cached_html(case, "details:analysis", lambda: f"""
+<div class='case-card' style='background: #f3e5f5;'>
+    <h3 style='color: #6b1e6f;'><i class='fas fa-brain'></i> AI Analysis</h3>
+    <div style='color: #4a0e4e; line-height: 1.8; white-space: pre-wrap;'>{esc(analysis)}</div>
+</div>
+""")
+    
+    if st.button(f"Ask AI About This Case", key=f"ask_{esc(case['id'])}", use_container_width=True):
+        st.session_state.current_case_id = case['id']
+        navigate_to('chat')
+
+def case_row(case):
+    icon = evidence_data_uri(case['icon_sha'])
+    icon_html = f'<img src="{icon}" class="case-row-icon">' if icon else '<i class="fas fa-paw case-row-icon"></i>'
+    return f"""
+                <div class="case-row">
+                    {icon_html}
+                    <div><strong>{esc(case['id'])}</strong> - {esc(case['type'])} | {esc(case['animal_type'])} | {esc(case['timestamp'])}<br/>
+                    <span class="status-badge">{esc(case['status'])}</span></div>
+                </div>
+                """
+
+@st.fragment
+def status_list():
+    # Paging and opening cases rerun only the list, not the header and totals above it
+    total_cases = count_cases()
+    page_count = -(-total_cases // CASES_PER_PAGE)
+    page = min(st.session_state.status_page_num, page_count - 1)
+
+    # Only the opened case builds its images and detail cards; the rest are one-line rows
+    for case in list_case_summaries(limit=CASES_PER_PAGE, offset=page * CASES_PER_PAGE):
+        is_open = st.session_state.open_case_id == case['id']
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            cached_html(case, "row", lambda: case_row(case))
+        with col2:
+            if st.button("Hide" if is_open else "View", key=f"view_{esc(case['id'])}", use_container_width=True):
+                st.session_state.open_case_id = None if is_open else case['id']
+                rerun_fragment()
+        if is_open:
+            case_details(get_case(case['id']))
+
+    if page_count > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("Previous", disabled=page == 0, use_container_width=True):
+                st.session_state.status_page_num = page - 1
+                rerun_fragment()
+        with col2:
+            st.markdown(f"<p style='text-align: center; color: #6b1e6f;'>Page {page + 1} of {page_count}</p>", unsafe_allow_html=True)
+        with col3:
+            if st.button("Next", disabled=page >= page_count - 1, use_container_width=True):
+                st.session_state.status_page_num = page + 1
+                rerun_fragment()
+
 def status_page():
     show_header()
     
     if st.button("Back to Home"):
         navigate_to('home')
     
+    total_cases = count_cases()
     st.markdown(f"""
     <h2 style='color: #6b1e6f;'><i class='fas fa-clipboard-list'></i> Case Status Dashboard
-    <span class="status-badge"><i class='fas fa-folder-open'></i> {len(st.session_state.cases)} Cases</span></h2>
+    <span class="status-badge"><i class='fas fa-folder-open'></i> {total_cases} Cases</span></h2>
     """, unsafe_allow_html=True)
     
-    if len(st.session_state.cases) == 0:
+    if total_cases == 0:
         st.markdown("""
         <div class="case-card" style="text-align: center; padding: 60px 20px;">
             <i class="fas fa-folder-open" style="font-size: 80px; color: #e2a9f1; margin-bottom: 20px;"></i>
@@ -630,14 +727,14 @@ def status_page():
         </div>
         """, unsafe_allow_html=True)
     else:
-        injury_cases = sum(1 for c in st.session_state.cases if c['type'] == 'Injury')
-        abuse_cases = sum(1 for c in st.session_state.cases if c['type'] == 'Abuse')
+        injury_cases = count_cases('Injury')
+        abuse_cases = count_cases('Abuse')
         
         col1, col2, col3 = st.columns(3)
         with col1:
             st.markdown(f"""
             <div class="case-card" style="text-align: center; background: linear-gradient(135deg, #e8f5e9 0%, #c8e6c9 100%); border-left: 5px solid #4caf50;">
-                <h2 style="color: #2e7d32; margin: 0;">{len(st.session_state.cases)}</h2>
+                <h2 style="color: #2e7d32; margin: 0;">{total_cases}</h2>
                 <p style="color: #1b5e20; margin: 5px 0;">Total Cases</p>
             </div>
             """, unsafe_allow_html=True)
@@ -656,143 +753,62 @@ def status_page():
             </div>
             """, unsafe_allow_html=True)
         
+        st.markdown(f"""
+        <p style="text-align: center;">
+            <span class="status-badge"><i class="fas fa-ambulance"></i> {count_by_status('Ambulance Dispatched')} Ambulances Dispatched</span>
+            <span class="status-badge"><i class="fas fa-shield-alt"></i> {count_by_status('Police Notified - FIR Filed')} FIRs Filed</span>
+        </p>
+        """, unsafe_allow_html=True)
+        
         st.markdown("<hr style='margin: 30px 0; border: 1px solid #e2a9f1;'>", unsafe_allow_html=True)
         
-        for idx, case in enumerate(reversed(st.session_state.cases)):
-            with st.expander(f"{case['id']} - {case['type']} | {case['animal_type']} | {case['timestamp']}", expanded=False):
-                
-                if case['type'] == 'Abuse' and case.get('culprit_data'):
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.markdown(f"""
-                        <div class="image-container">
-                            <h4 style="color: #6b1e6f; margin-top: 0;">Animal/Incident</h4>
-                            <img src="data:image/jpeg;base64,{case['image_data']}" style="max-width: 100%; max-height: 400px; border-radius: 10px;">
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col2:
-                        st.markdown(f"""
-                        <div class="image-container">
-                            <h4 style="color: #6b1e6f; margin-top: 0;">Culprit</h4>
-                            <img src="data:image/jpeg;base64,{case['culprit_data']}" style="max-width: 100%; max-height: 400px; border-radius: 10px;">
-                        </div>
-                        """, unsafe_allow_html=True)
-                elif 'image_data' in case:
-                    st.markdown(f"""
-                    <div class="image-container">
-                        <h4 style="color: #6b1e6f; margin-top: 0;">Animal Image</h4>
-                        <img src="data:image/jpeg;base64,{case['image_data']}" style="max-width: 100%; max-height: 400px; border-radius: 10px;">
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                st.markdown(f"""
-                <div class="case-card">
-                    <h3 style="color: #6b1e6f;"><i class="fas fa-info-circle"></i> Case Information</h3>
-                    <div class="detail-row">
-                        <span class="detail-label">Case ID:</span>
-                        <span class="detail-value">{case['id']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Type:</span>
-                        <span class="detail-value">{case['type']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Animal:</span>
-                        <span class="detail-value">{case['animal_type']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Location:</span>
-                        <span class="detail-value">{case['location']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Timestamp:</span>
-                        <span class="detail-value">{case['timestamp']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="detail-label">Status:</span>
-                        <span class="detail-value"><span class="status-badge">{case['status']}</span></span>
-                    </div>
-                    <div style="margin-top: 15px; padding-top: 15px; border-top: 1px solid #e2a9f1;">
-                        <span class="detail-label">Description:</span>
-                        <p style="color: #4a0e4e; margin-top: 8px; line-height: 1.6;">{case['description']}</p>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                if case['type'] == 'Injury' and case.get('selected_hospital'):
-                    hospital = case['selected_hospital']
-                    st.markdown(f"""
-                    <div class="dispatch-box">
-                        <h3 style="color: #e65100; margin-top: 0;"><i class="fas fa-ambulance"></i> Ambulance & Hospital</h3>
-                        <div class="detail-row">
-                            <span class="detail-label">Hospital:</span>
-                            <span class="detail-value">{hospital['name']}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Speciality:</span>
-                            <span class="detail-value">{hospital['speciality']}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Contact:</span>
-                            <span class="detail-value">{hospital['contact']}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Fees:</span>
-                            <span class="detail-value">{hospital['fees']}</span>
-                        </div>
-                        <hr style="border: 1px solid #ff9800; margin: 15px 0;">
-                        <div class="detail-row">
-                            <span class="detail-label">Driver:</span>
-                            <span class="detail-value">{case['driver_name']}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Contact:</span>
-                            <span class="detail-value">{case['driver_contact']}</span>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
+        status_list()
+
+@st.fragment
+def chat_panel(has_case):
+    # Transcript and input: sending a message reruns only this panel
+    memory = st.session_state.chat_memory
+    st.markdown("<div class='chat-container'>", unsafe_allow_html=True)
+    if memory.greeting:
+        st.markdown(chat_bubble("assistant", memory.greeting), unsafe_allow_html=True)
+    hidden = len(memory.messages) - CHAT_DISPLAY_LIMIT
+    if hidden > 0:
+        st.caption(f"{hidden} earlier messages not shown")
+    for msg in memory.messages[-CHAT_DISPLAY_LIMIT:]:
+        st.markdown(chat_bubble(msg["role"], msg["content"]), unsafe_allow_html=True)
+    transcript_tail = st.container()
+    st.markdown("</div>", unsafe_allow_html=True)
+    
+    user_input = st.text_area("Type your message...", height=100, placeholder="Ask me anything...", key="chat_input")
+    
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        if st.button("Send", use_container_width=True):
+            if user_input.strip():
+                prompt = memory.build_prompt(user_input)
+                # Only an opening question carries no context, so only then can its answer be shared
+                fresh = not memory.messages and not memory.summary
+                memory.add("user", user_input)
                 
-                if case['type'] == 'Abuse':
-                    st.markdown(f"""
-                    <div class="case-card" style="background: #fff8e1;">
-                        <h3 style="color: #f57c00;"><i class="fas fa-exclamation-triangle"></i> Abuse Details</h3>
-                        <div class="detail-row">
-                            <span class="detail-label">Abuse Type:</span>
-                            <span class="detail-value">{case['abuse_type']}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Culprit Photo:</span>
-                            <span class="detail-value">{case['culprit_photo']}</span>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
+                with transcript_tail:
+                    st.markdown(chat_bubble("user", user_input), unsafe_allow_html=True)
                     
-                    if case.get('police_notified'):
-                        st.markdown(f"""
-                        <div class="police-box">
-                            <h3 style="color: #1565c0; margin-top: 0;"><i class="fas fa-shield-alt"></i> Police Status</h3>
-                            <div class="detail-row">
-                                <span class="detail-label">FIR:</span>
-                                <span class="detail-value">{case['fir_number']}</span>
-                            </div>
-                            <div class="detail-row">
-                                <span class="detail-label">Status:</span>
-                                <span class="detail-value">Notified & FIR Filed</span>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                
-                st.markdown(f"""
-<div class='case-card' style='background: #f3e5f5;'>
-    <h3 style='color: #6b1e6f;'><i class='fas fa-brain'></i> AI Analysis</h3>
-    <div style='color: #4a0e4e; line-height: 1.8; white-space: pre-wrap;'>{case['analysis']}</div>
-</div>
-""", unsafe_allow_html=True)
-                
-                
-                if st.button(f"Ask AI About This Case", key=f"ask_{case['id']}_{idx}", use_container_width=True):
-                    st.session_state.current_case_id = case['id']
-                    navigate_to('chat')
+                    # Without a case in context, FAQ-style questions are cached; an opening question is
+                    # keyed on itself, a follow-up on the whole prompt including the conversation
+                    category = "chat" if has_case else chat_category(user_input)
+                    cache_key = user_input if category != "chat" and fresh else None
+                    reply = analyze_with_groq(prompt, stream=True, category=category, cache_key=cache_key,
+                                              severity=memory.case_severity)
+                    response = render_stream(st.empty(), lambda text: chat_bubble("assistant", text), reply)
+                    memory.add("assistant", response)
+                    memory.compact()
+                    rerun_fragment()
+    
+    with col2:
+        if st.button("Clear", use_container_width=True):
+            # The greeting is built by the page, so clearing reruns all of it
+            st.session_state.chat_memory = ChatMemory()
+            st.rerun()
 
 def chat_page():
     show_header()
@@ -802,9 +818,14 @@ def chat_page():
     
     st.markdown("<h2 style='color: #6b1e6f;'><i class='fas fa-robot'></i> AI Sathi - Your Animal Welfare Assistant</h2>", unsafe_allow_html=True)
     
-    if len(st.session_state.chat_history) == 0:
+    current_case = get_case(st.session_state.current_case_id) if st.session_state.current_case_id else None
+    
+    memory = st.session_state.chat_memory
+    memory.set_case(current_case)
+    
+    if memory.greeting is None:
+        memory.greeting = ""
         if st.session_state.current_case_id:
-            current_case = next((c for c in st.session_state.cases if c['id'] == st.session_state.current_case_id), None)
             if current_case:
                 case_context = f"""Hello! I am your AI Sathi. I see you have an active case:
 
@@ -830,9 +851,9 @@ Police: Notified & FIR Filed
 """
                 
                 case_context += """I know all details about your case. Ask me anything!"""
-                st.session_state.chat_history.append({"role": "assistant", "content": case_context})
+                memory.greeting = case_context
         else:
-            st.session_state.chat_history.append({"role": "assistant", "content": """Hello! I am your AI Sathi. I can help with:
+            memory.greeting = """Hello! I am your AI Sathi. I can help with:
 
 - Animal injuries/abuse reporting
 - Animal welfare laws
@@ -840,70 +861,9 @@ Police: Notified & FIR Filed
 - Finding veterinary services
 - Animal care advice
 
-How can I help you today?"""})
-    
-    st.markdown("<div class='chat-container'>", unsafe_allow_html=True)
-    for msg in st.session_state.chat_history:
-        if msg["role"] == "assistant":
-            st.markdown(f"""
-            <div class="chat-message bot-message">
-                <strong><i class="fas fa-robot"></i> AI Sathi:</strong><br/>
-                {msg["content"]}
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown(f"""
-            <div class="chat-message user-message">
-                <strong><i class="fas fa-user"></i> You:</strong><br/>
-                {msg["content"]}
-            </div>
-            """, unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
-    
-    user_input = st.text_area("Type your message...", height=100, placeholder="Ask me anything...", key="chat_input")
-    
-    col1, col2 = st.columns([4, 1])
-    with col1:
-        if st.button("Send", use_container_width=True):
-            if user_input.strip():
-                st.session_state.chat_history.append({"role": "user", "content": user_input})
-                
-                with st.spinner("Thinking..."):
-                    context = ""
-                    if st.session_state.current_case_id:
-                        current_case = next((c for c in st.session_state.cases if c['id'] == st.session_state.current_case_id), None)
-                        if current_case:
-                            context = f"""Current Case:
-- ID: {current_case['id']}
-- Type: {current_case['type']}
-- Animal: {current_case['animal_type']}
-- Location: {current_case['location']}
-- Status: {current_case['status']}
-- Analysis: {current_case['analysis']}
-"""
-                            if current_case['type'] == 'Injury' and current_case.get('selected_hospital'):
-                                hospital = current_case['selected_hospital']
-                                context += f"- Hospital: {hospital['name']}, {hospital['contact']}\n"
-                    
-                    prompt = f"""You are AI Sathi, a compassionate animal welfare assistant.
-
-{context}
-
-Recent chat:
-{chr(10).join([f"{m['role']}: {m['content']}" for m in st.session_state.chat_history[-5:]])}
-
-Question: {user_input}
-
-Respond in a caring, professional manner. Be concise but comprehensive."""
-                    
-                    response = analyze_with_groq(prompt)
-                    st.session_state.chat_history.append({"role": "assistant", "content": response})
-                    st.rerun()
+How can I help you today?"""
     
-    with col2:
-        if st.button("Clear", use_container_width=True):
-            st.session_state.chat_history = []
-            st.rerun()
+    chat_panel(current_case is not None)
     
     st.markdown("<h3 style='color: #6b1e6f;'>Quick Actions</h3>", unsafe_allow_html=True)
     col1, col2, col3 = st.columns(3)
@@ -918,14 +878,56 @@ Respond in a caring, professional manner. Be concise but comprehensive."""
         if st.button("Check Status", key="chat_status"):
             navigate_to('status')
 
+def admin_page():
+    show_header()
+    
+    if st.button("Back to Home"):
+        navigate_to('home')
+    
+    st.markdown("<h2 style='color: #6b1e6f;'><i class='fas fa-chart-line'></i> Latency & Metrics</h2>", unsafe_allow_html=True)
+    
+    rows = [{"span": row["span"], "labels": ", ".join(f"{k}={v}" for k, v in row["labels"].items()),
+             "count": row["count"], "p50 ms": row["p50_ms"], "p95 ms": row["p95_ms"]} for row in latency_summary()]
+    st.markdown("<h3 style='color: #6b1e6f;'>Spans</h3>", unsafe_allow_html=True)
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    
+    st.markdown("<h3 style='color: #6b1e6f;'>Counters</h3>", unsafe_allow_html=True)
+    st.dataframe([{"counter": row["counter"], "labels": ", ".join(f"{k}={v}" for k, v in row["labels"].items()),
+                   "value": row["value"]} for row in counter_values()], use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("<h3 style='color: #6b1e6f;'>Response Cache</h3>", unsafe_allow_html=True)
+        st.json(response_cache.stats())
+    with col2:
+        st.markdown("<h3 style='color: #6b1e6f;'>Scheduler</h3>", unsafe_allow_html=True)
+        st.json(scheduler.stats())
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("<h3 style='color: #6b1e6f;'>Replica</h3>", unsafe_allow_html=True)
+        st.json(change_feed.stats())
+    with col2:
+        st.markdown("<h3 style='color: #6b1e6f;'>Ambulance Fleet</h3>", unsafe_allow_html=True)
+        st.json(get_fleet().stats())
+    
+    st.markdown("<h3 style='color: #6b1e6f;'>Fragment Cache</h3>", unsafe_allow_html=True)
+    st.json(fragment_cache.stats())
+    
+    if st.button("Refresh"):
+        st.rerun()
+
 # Main routing
-if st.session_state.current_page == 'home':
-    home_page()
-elif st.session_state.current_page == 'injury':
-    injury_page()
-elif st.session_state.current_page == 'abuse':
-    abuse_page()
-elif st.session_state.current_page == 'status':
-    status_page()
-elif st.session_state.current_page == 'chat':
-    chat_page()
+with span("page", page=st.session_state.current_page):
+    if st.session_state.current_page == 'home':
+        home_page()
+    elif st.session_state.current_page == 'injury':
+        injury_page()
+    elif st.session_state.current_page == 'abuse':
+        abuse_page()
+    elif st.session_state.current_page == 'status':
+        status_page()
+    elif st.session_state.current_page == 'chat':
+        chat_page()
+    elif st.session_state.current_page == 'admin' and ADMIN_ENABLED:
+        admin_page()
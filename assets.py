@@ -0,0 +1,140 @@
+import base64
+import glob
+import hashlib
+import io
+import os
+import re
+import threading
+from functools import lru_cache
+from urllib.parse import quote
+
+import streamlit as st
+from PIL import Image
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATED_DIR = os.path.join(APP_DIR, "static", "generated")
+THEME_DIR = os.path.join(APP_DIR, "theme")
+
+# name -> source file; variants are produced per requested width
+ASSETS = {
+    "logo": "logo.png",
+    "hero": "main.png",
+}
+
+# Files scanned for the fa-* icon classes the markup uses; only those icons are bundled
+ICON_SOURCES = ("app.py",)
+# Font Awesome 6 file names for the older icon names used in the markup
+ICON_ALIASES = {
+    "ambulance": "truck-medical",
+    "shield-alt": "shield-halved",
+    "check-circle": "circle-check",
+    "info-circle": "circle-info",
+    "exclamation-triangle": "triangle-exclamation",
+}
+ICON_CREDIT = "/* Icons: Font Awesome Free 6.4.0 by @fontawesome - https://fontawesome.com (CC BY 4.0) */"
+
+_write_lock = threading.Lock()
+
+
+def _publish(filename, data):
+    # Writes into the static folder and returns a URL; ?v= makes the static handler send
+    # long-lived cache headers
+    target = os.path.join(GENERATED_DIR, filename)
+    with _write_lock:
+        os.makedirs(GENERATED_DIR, exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+    return f"app/static/generated/{filename}?v={hashlib.sha256(data).hexdigest()[:12]}"
+
+
+@lru_cache(maxsize=16)
+def _build_variant(name, path, mtime_ns, width):
+    with Image.open(path) as img:
+        img.load()
+        if img.width > width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format="WEBP", quality=82)
+    data = buf.getvalue()
+    return {"url": _publish(f"{name}-{width}.webp", data), "data": data}
+
+
+@lru_cache(maxsize=16)
+def _data_uri(name, mtime_ns, width):
+    variant = _build_variant(name, os.path.join(APP_DIR, ASSETS[name]), mtime_ns, width)
+    return f"data:image/webp;base64,{base64.b64encode(variant['data']).decode()}"
+
+
+def asset_src(name, width):
+    path = os.path.join(APP_DIR, ASSETS[name])
+    mtime_ns = os.stat(path).st_mtime_ns
+    if st.get_option("server.enableStaticServing"):
+        return _build_variant(name, path, mtime_ns, width)["url"]
+    return _data_uri(name, mtime_ns, width)
+
+
+def asset_srcset(name, widths):
+    return ", ".join(f"{asset_src(name, w)} {w}w" for w in widths)
+
+
+def used_icons():
+    names = set()
+    for source in ICON_SOURCES:
+        with open(os.path.join(APP_DIR, source), encoding="utf-8") as f:
+            names.update(re.findall(r"\bfa-([a-z0-9]+(?:-[a-z0-9]+)*)", f.read()))
+    return sorted(names)
+
+
+def _icon_path(name):
+    return os.path.join(THEME_DIR, "icons", f"{ICON_ALIASES.get(name, name)}.svg")
+
+
+def _minify(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def _icon_rules():
+    # Each icon becomes an SVG data URI used as a mask, so no icon font is downloaded
+    rules = []
+    for name in used_icons():
+        if not os.path.exists(_icon_path(name)):
+            continue
+        with open(_icon_path(name), encoding="utf-8") as f:
+            svg = re.sub(r"<!--.*?-->", "", f.read()).strip()
+        rules.append(f'.fa-{name}{{--fa-icon:url("data:image/svg+xml,{quote(svg, safe=" /=:.-")}")}}')
+    return rules
+
+
+@lru_cache(maxsize=4)
+def _build_theme(stamp):
+    with open(os.path.join(THEME_DIR, "pawalert.css"), encoding="utf-8") as f:
+        css = _minify(f.read())
+    return "<style>" + ICON_CREDIT + css + "".join(_icon_rules()) + "</style>"
+
+
+def _theme_stamp():
+    paths = [os.path.join(THEME_DIR, "pawalert.css"), *(os.path.join(APP_DIR, s) for s in ICON_SOURCES)]
+    paths += sorted(glob.glob(os.path.join(THEME_DIR, "icons", "*.svg")))
+    return tuple((p, os.stat(p).st_mtime_ns) for p in paths)
+
+
+def theme_css():
+    # One <style> block with the theme and icons; nothing is fetched from third parties
+    return _build_theme(_theme_stamp())
+
+
+if __name__ == "__main__":
+    # Prebuild at deploy time: writes image variants to static/generated and reports missing icons
+    css = _build_theme(_theme_stamp())
+    for name, widths in (("logo", (240,)), ("hero", (600, 1200))):
+        for width in widths:
+            asset_src(name, width)
+    missing_icons = [name for name in used_icons() if not os.path.exists(_icon_path(name))]
+    print(f"theme: {len(css) / 1024:.1f} KiB, {len(used_icons()) - len(missing_icons)} icons")
+    if missing_icons:
+        print(f"no SVG in theme/icons for: {', '.join(missing_icons)}")
@@ -0,0 +1,131 @@
+import argparse
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet import Fleet, Vehicle  # noqa: E402
+
+CITIES = {
+    "Delhi": (28.6139, 77.2090), "Mumbai": (19.0760, 72.8777), "Bangalore": (12.9716, 77.5946),
+    "Chennai": (13.0827, 80.2707), "Kolkata": (22.5726, 88.3639), "Hyderabad": (17.3850, 78.4867),
+}
+
+
+def _point(rng, spread_km=10):
+    lat, lon = CITIES[rng.choice(list(CITIES))]
+    return lat + rng.gauss(0, spread_km / 110.57), lon + rng.gauss(0, spread_km / 105.0)
+
+
+def make_fleet(count, seed):
+    rng = random.Random(seed)
+    return Fleet([Vehicle(i, None, f"Driver {i}", "", *_point(rng)) for i in range(1, count + 1)])
+
+
+def stress(fleet, threads, operations, seed):
+    # Many threads assign and release at once; any vehicle handed out twice is a failure
+    booked = {}
+    booked_lock = threading.Lock()
+    double_bookings = []
+    latencies = []
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        held = []
+        local = []
+        for n in range(operations):
+            lat, lon = _point(rng)
+            start = time.perf_counter()
+            assigned = fleet.assign(f"W{worker_id}-{n}", lat, lon)
+            local.append(time.perf_counter() - start)
+            if assigned:
+                vehicle = assigned[0]
+                with booked_lock:
+                    if vehicle.id in booked:
+                        double_bookings.append(vehicle.id)
+                    booked[vehicle.id] = worker_id
+                held.append(vehicle)
+            if held and (len(held) > 5 or rng.random() < 0.5):
+                vehicle = held.pop(rng.randrange(len(held)))
+                with booked_lock:
+                    del booked[vehicle.id]
+                fleet.release(vehicle.id, *_point(rng))
+        with booked_lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "threads": threads,
+        "assignments": len(latencies),
+        "assignments_per_second": round(len(latencies) / elapsed),
+        "assign_p50_us": round(latencies[len(latencies) // 2] * 1e6, 1),
+        "assign_p99_us": round(latencies[int(len(latencies) * 0.99)] * 1e6, 1),
+        "double_bookings": len(double_bookings),
+    }
+
+
+def simulate(fleet, requests_per_minute, minutes, seed):
+    # Discrete-event run in simulated minutes: Poisson arrivals, each ride busy for ETA + 30-90 min
+    rng = random.Random(seed)
+    releases = []
+    etas, unserved, now, served = [], 0, 0.0, 0
+    while now < minutes:
+        now += rng.expovariate(requests_per_minute)
+        while releases and releases[0][0] <= now:
+            _, vehicle_id, lat, lon = heapq.heappop(releases)
+            fleet.release(vehicle_id, lat, lon)
+        lat, lon = _point(rng)
+        assigned = fleet.assign(f"R{served + unserved}", lat, lon)
+        if assigned is None:
+            unserved += 1
+            continue
+        vehicle, _, eta = assigned
+        served += 1
+        etas.append(eta)
+        heapq.heappush(releases, (now + eta + rng.uniform(30, 90), vehicle.id, lat, lon))
+    return {
+        "requests_per_minute": requests_per_minute,
+        "simulated_minutes": minutes,
+        "served": served,
+        "unserved": unserved,
+        "eta_median_min": statistics.median(etas) if etas else None,
+        "eta_p95_min": sorted(etas)[int(len(etas) * 0.95)] if etas else None,
+        "busy_at_end": fleet.stats()["busy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the ambulance dispatch engine under load")
+    parser.add_argument("--vehicles", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--operations", type=int, default=2000, help="assignments per thread in the stress run")
+    parser.add_argument("--rate", type=float, default=10, help="requests per simulated minute")
+    parser.add_argument("--minutes", type=float, default=240, help="simulated minutes")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    report = {
+        "vehicles": args.vehicles,
+        "stress": stress(make_fleet(args.vehicles, args.seed), args.threads, args.operations, args.seed),
+        "simulation": simulate(make_fleet(args.vehicles, args.seed), args.rate, args.minutes, args.seed),
+    }
+    print(json.dumps(report, indent=2))
+    if report["stress"]["double_bookings"]:
+        raise SystemExit("double booking detected")
+
+
+if __name__ == "__main__":
+    main()
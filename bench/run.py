@@ -0,0 +1,260 @@
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+PAGES = ("home", "status", "status_open", "injury", "abuse", "chat", "chat_send")
+
+
+def _seed(count, images):
+    from PIL import Image, ImageDraw
+
+    from blobs import put_blob
+    from hospitals import location_coords
+    from media import preprocess_image
+    from pipeline import recommend_hospitals
+    from storage import create_case, dispatch_ambulance, get_case, next_sequence, notify_police
+
+    evidence = {}
+    if images:
+        img = Image.new("RGB", (1600, 1200), (180, 140, 110))
+        ImageDraw.Draw(img).ellipse((400, 300, 1200, 900), fill=(90, 60, 40))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=90)
+        variants = preprocess_image(io.BytesIO(buf.getvalue()))
+        evidence = {
+            "image": put_blob(buf.getvalue()),
+            "image_model": put_blob(variants["model"]),
+            "image_thumb": put_blob(variants["thumbnail"]),
+            "image_icon": put_blob(variants["icon"]),
+        }
+
+    locations = ("Connaught Place, Delhi", "MG Road, Bangalore", "Marine Drive, Mumbai")
+    for i in range(count):
+        injury = i % 2 == 0
+        location = locations[i % len(locations)]
+        latitude, longitude = location_coords(location)
+        case = {
+            "id": f"INJ{next_sequence('injury')}" if injury else f"ABU{next_sequence('abuse')}",
+            "type": "Injury" if injury else "Abuse",
+            "animal_type": ("Dog", "Cat", "Cow")[i % 3],
+            "abuse_type": None if injury else "Neglect",
+            "location": location,
+            "latitude": latitude,
+            "longitude": longitude,
+            "description": "Animal found near the road, limping and unable to put weight on one leg.",
+            "timestamp": f"2026-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+            "status": "Case Registered",
+            "analysis": "Severity Level: Moderate\nVisible Injuries: cut on the foreleg\nRecovery Time: 2 weeks",
+            "culprit_photo": None if injury else "Not Provided",
+            "fir_number": None if injury else f"FIR/2026/ANM/{next_sequence('fir')}",
+        }
+        create_case(case, recommend_hospitals(latitude, longitude) if injury else (), evidence=evidence)
+        if injury and i % 4 == 0:
+            dispatch_ambulance(case["id"], get_case(case["id"])["hospitals"][0]["id"],
+                               "Rajesh Kumar", "+91 98765-00001", case["timestamp"])
+        elif not injury and i % 4 == 1:
+            notify_police(case["id"], case["timestamp"])
+
+
+def _emitted_bytes(at):
+    # Serialized size of every element delta the script sent, i.e. what the browser receives
+    def walk(node):
+        proto = getattr(node, "proto", None)
+        size = proto.ByteSize() if proto is not None and hasattr(proto, "ByteSize") else 0
+        return size + sum(walk(child) for child in getattr(node, "children", {}).values())
+    return walk(at._tree)
+
+
+def _run_scenario(count, images, runs, latency):
+    os.environ["PAWALERT_DATA_DIR"] = tempfile.mkdtemp(prefix="pawalert-bench-")
+    sys.path.insert(0, APP_DIR)
+
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    import inference
+    from stub_client import StubClient
+    from storage import list_case_summaries
+
+    inference._client = StubClient(first_token_latency=latency)
+    inference._client_key = "bench"
+    # AppTest re-runs forever on st.rerun() after a click; ending the run is equivalent here
+    st.rerun = st.stop
+
+    _seed(count, images)
+    first = {case["type"]: case["id"] for case in reversed(list_case_summaries(limit=10))}
+
+    def setup(page):
+        at = AppTest.from_file(os.path.join(APP_DIR, "app.py"), default_timeout=120)
+        at.secrets["GROQ_API_KEY"] = "bench"
+        at.session_state.current_page = page.split("_")[0]
+        if page == "status_open":
+            at.session_state.open_case_id = first.get("Injury")
+        if page in ("injury", "abuse") and page.title() in first:
+            case_type = "Injury" if page == "injury" else "Abuse"
+            at.session_state.current_case_id = first[case_type]
+            at.session_state.processing_complete = True
+        if page.startswith("chat"):
+            at.session_state.current_case_id = first.get("Injury")
+        return at
+
+    def rerun(at, page):
+        if page == "chat_send":
+            at.text_area(key="chat_input").input("How do I keep the dog calm until help arrives?")
+            next(b for b in at.button if b.label == "Send").click()
+        at.run()
+
+    results = []
+    for page in PAGES:
+        at = setup(page)
+        start = time.perf_counter()
+        at.run()
+        cold_ms = (time.perf_counter() - start) * 1000
+        if at.exception:
+            results.append({"cases": count, "images": images, "page": page, "error": str(at.exception[0].value)})
+            continue
+
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            rerun(at, page)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        rerun(at, page)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings.sort()
+        results.append({
+            "cases": count,
+            "images": images,
+            "page": page,
+            "cold_ms": round(cold_ms, 2),
+            "wall_ms": {
+                "median": round(statistics.median(timings), 2),
+                "p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+                "min": round(timings[0], 2),
+            },
+            "emitted_bytes": _emitted_bytes(at),
+            "markdown_bytes": sum(len(m.value.encode()) for m in at.markdown),
+            "elements": len(at.markdown) + len(at.button) + len(at.caption),
+            "peak_kib": round(peak / 1024, 1),
+        })
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for row in results:
+        row["process_max_rss_kib"] = rss // 1024 if sys.platform == "darwin" else rss
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, image_modes, runs, latency, output):
+    results = []
+    for count in sizes:
+        for images in image_modes:
+            # One process per scenario so every run starts from a cold database and its own RSS
+            print(f"cases={count} images={images} ...", file=sys.stderr, flush=True)
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--scenario", str(count),
+                 "--images" if images else "--no-images", "--runs", str(runs), "--latency", str(latency)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                sys.stderr.write(proc.stderr)
+                raise SystemExit(f"scenario cases={count} images={images} failed")
+            results += json.loads(proc.stdout.strip().splitlines()[-1])
+
+    import streamlit
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "streamlit": streamlit.__version__,
+            "runs": runs,
+            "stub_latency_s": latency,
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    _print_table(results)
+    print(f"\nSaved {output}")
+
+
+def _print_table(results, baseline=None):
+    base = {(r["cases"], r["images"], r["page"]): r for r in baseline or []}
+    print(f"{'cases':>6} {'img':>4} {'page':<12} {'median ms':>10} {'p95 ms':>8} {'KiB sent':>9} {'peak KiB':>9}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['cases']:>6} {str(r['images'])[0]:>4} {r['page']:<12} error: {r['error']}")
+            continue
+        line = (f"{r['cases']:>6} {str(r['images'])[0]:>4} {r['page']:<12} {r['wall_ms']['median']:>10.1f} "
+                f"{r['wall_ms']['p95']:>8.1f} {r['emitted_bytes'] / 1024:>9.1f} {r['peak_kib']:>9.1f}")
+        old = base.get((r["cases"], r["images"], r["page"]))
+        if old and "wall_ms" in old:
+            line += (f"   {_delta(old['wall_ms']['median'], r['wall_ms']['median'])} time,"
+                     f" {_delta(old['emitted_bytes'], r['emitted_bytes'])} bytes")
+        print(line)
+
+
+def _delta(old, new):
+    return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+
+
+def compare(baseline_path, current_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+    print(f"{baseline['meta']['revision']} -> {current['meta']['revision']}")
+    _print_table(current["results"], baseline["results"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PawAlert page reruns with a stubbed Groq client")
+    parser.add_argument("--sizes", default="0,100,1000", help="comma-separated numbers of seeded cases")
+    parser.add_argument("--images", dest="images", action="store_true", default=None, help="only seed with images")
+    parser.add_argument("--no-images", dest="images", action="store_false", help="only seed without images")
+    parser.add_argument("--runs", type=int, default=5, help="timed reruns per page")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub time-to-first-token in seconds")
+    parser.add_argument("--output", help="JSON file to write (default bench/results/<revision>-<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two result files")
+    parser.add_argument("--scenario", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.scenario is not None:
+        print(json.dumps(_run_scenario(args.scenario, args.images is not False, args.runs, args.latency)))
+    else:
+        image_modes = (True, False) if args.images is None else (args.images,)
+        output = args.output or os.path.join(
+            RESULTS_DIR, f"{_git_revision() or 'local'}-{datetime.now():%Y%m%d-%H%M%S}.json")
+        run([int(n) for n in args.sizes.split(",")], image_modes, args.runs, args.latency, output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import time
+from types import SimpleNamespace
+
+REPLY = ("Severity Level: Moderate. Visible injuries include a shallow cut on the left foreleg. "
+         "Keep the animal calm and still, cover the wound with a clean cloth and wait for the team. "
+         "Recovery Time: one to two weeks with regular dressing.")
+
+
+class _Completions:
+    # Deterministic stand-in for client.chat.completions: fixed reply, configurable latency
+    def __init__(self, first_token_latency, chunk_latency):
+        self.first_token_latency = first_token_latency
+        self.chunk_latency = chunk_latency
+        self.calls = 0
+        self.with_raw_response = _RawCompletions(self)
+
+    def _chunks(self):
+        for word in REPLY.split(" "):
+            if self.chunk_latency:
+                time.sleep(self.chunk_latency)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+    def create(self, model, messages, max_tokens, stream=False, **kwargs):
+        self.calls += 1
+        time.sleep(self.first_token_latency)
+        if stream:
+            return self._chunks()
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=REPLY))])
+
+
+class _RawCompletions:
+    def __init__(self, completions):
+        self._completions = completions
+
+    def create(self, **kwargs):
+        headers = {"x-ratelimit-remaining-requests": "1000", "x-ratelimit-reset-requests": "60s"}
+        return SimpleNamespace(headers=headers, parse=lambda: self._completions.create(**kwargs))
+
+
+class StubClient:
+    def __init__(self, first_token_latency=0.2, chunk_latency=0.0):
+        self.chat = SimpleNamespace(completions=_Completions(first_token_latency, chunk_latency))
@@ -0,0 +1,62 @@
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+from storage import DATA_DIR
+
+BLOB_DIR = os.path.join(DATA_DIR, "blobs")
+CHUNK_SIZE = 1024 * 1024
+
+
+def blob_path(sha):
+    return os.path.join(BLOB_DIR, sha[:2], sha)
+
+
+def _commit(tmp_path, sha):
+    # Identical content hashes to the same path, so a second upload is simply dropped
+    path = blob_path(sha)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    return sha
+
+
+def put_blob_stream(fileobj):
+    # Hash while spooling to disk so the upload is never joined into one bytes object
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(dir=BLOB_DIR, delete=False) as tmp:
+        for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            tmp.write(chunk)
+    return _commit(tmp.name, digest.hexdigest())
+
+
+def put_blob(data):
+    sha = hashlib.sha256(data).hexdigest()
+    if os.path.exists(blob_path(sha)):
+        return sha
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=BLOB_DIR, delete=False) as tmp:
+        tmp.write(data)
+    return _commit(tmp.name, sha)
+
+
+@contextmanager
+def open_blob(sha):
+    # Read-only memory map; callers get a memoryview and must not keep it past the block
+    with open(blob_path(sha), "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield memoryview(b"")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()
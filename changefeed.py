@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from collections import defaultdict
+
+from storage import REPLICA_ID, changes_since, latest_change, prune_changes
+from telemetry import count
+
+POLL_SECONDS = float(os.environ.get("PAWALERT_SYNC_INTERVAL", "1.0"))
+PRUNE_SECONDS = 3600
+
+
+class ChangeFeed:
+    # Tails the shared change log and hands other replicas' changes to subscribers as
+    # handler(case_id). Handlers run on the feed thread and must be quick and idempotent.
+    def __init__(self, interval=POLL_SECONDS):
+        self.interval = interval
+        self.cursor = None
+        self.applied = 0
+        self._handlers = defaultdict(list)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_prune = time.time()
+
+    def subscribe(self, kinds, handler):
+        # Subscribe before loading any snapshot, so nothing committed in between is missed
+        with self._lock:
+            if self.cursor is None:
+                self.cursor = latest_change()
+            for kind in kinds:
+                self._handlers[kind].append(handler)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="pawalert-changefeed", daemon=True)
+                self._thread.start()
+
+    def poll(self):
+        # Only the feed thread polls. Handlers run without the lock, so they may subscribe or
+        # wait on their own locks.
+        rows = changes_since(self.cursor)
+        for row in rows:
+            if row["origin"] != REPLICA_ID:
+                with self._lock:
+                    handlers = list(self._handlers.get(row["kind"], ()))
+                for handler in handlers:
+                    try:
+                        handler(row["case_id"])
+                    except Exception:
+                        count("changefeed_errors", kind=row["kind"])
+                self.applied += 1
+            self.cursor = row["seq"]
+        return len(rows)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+                if time.time() - self._last_prune > PRUNE_SECONDS:
+                    prune_changes()
+                    self._last_prune = time.time()
+            except Exception:
+                count("changefeed_errors", kind="poll")
+
+    def stats(self):
+        return {"replica": REPLICA_ID, "cursor": self.cursor, "applied": self.applied,
+                "subscribed": sorted(self._handlers)}
+
+
+change_feed = ChangeFeed()
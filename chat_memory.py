@@ -0,0 +1,122 @@
+import itertools
+
+from inference import complete
+from jobs import submit
+from scheduler import priority_for, severity_of
+
+# Verbatim turns kept in the prompt; older turns are folded into the running summary
+RECENT_TOKEN_BUDGET = 1200
+SUMMARY_TOKEN_LIMIT = 300
+ANALYSIS_TOKEN_LIMIT = 250
+
+_memory_ids = itertools.count(1)
+
+
+def count_tokens(text):
+    # ~4 characters per token is close enough for budgeting English prompts
+    return max(1, len(text) // 4)
+
+
+def _clip(text, tokens):
+    limit = tokens * 4
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " ..."
+
+
+def case_brief(case):
+    brief = f"""Current Case:
+- ID: {case['id']}
+- Type: {case['type']}
+- Animal: {case['animal_type']}
+- Location: {case['location']}
+- Status: {case['status']}
+- Analysis: {_clip(case['analysis'], ANALYSIS_TOKEN_LIMIT) if case['analysis'] else 'Pending'}
+"""
+    if case['type'] == 'Injury' and case.get('selected_hospital'):
+        hospital = case['selected_hospital']
+        brief += f"- Hospital: {hospital['name']}, {hospital['contact']}\n"
+    return brief
+
+
+def _summary_prompt(summary, turns):
+    transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    return f"""Update the running summary of a conversation between a user and AI Sathi, an animal welfare assistant.
+
+Summary so far:
+{summary or 'None'}
+
+New messages:
+{transcript}
+
+Write the updated summary in under {SUMMARY_TOKEN_LIMIT * 3 // 4} words. Keep names, places, case ids, advice given and open questions."""
+
+
+def _fold(job, memory, upto, summary, turns):
+    memory.summary = complete(_summary_prompt(summary, turns), category="summary", priority=priority_for("summary"))
+    memory.summarized_upto = upto
+    return memory.summary
+
+
+class ChatMemory:
+    def __init__(self):
+        self.id = next(_memory_ids)
+        self.greeting = None
+        self.messages = []
+        self.summary = ""
+        self.summarized_upto = 0
+        self._brief = ""
+        self._brief_key = None
+        self._fold_job = None
+        # Rating of the case in context; None without a case, which keeps chat on the fast model
+        self.case_severity = None
+
+    def set_case(self, case):
+        # The case brief is built once and only rebuilt when the case itself moves on
+        key = (case['id'], case['status'], bool(case['analysis'])) if case else None
+        if key != self._brief_key:
+            self._brief = case_brief(case) if case else ""
+            self._brief_key = key
+            self.case_severity = severity_of(case['analysis']) if case else None
+
+    def add(self, role, content):
+        self.messages.append({"role": role, "content": content, "tokens": count_tokens(content)})
+
+    def _recent(self):
+        # Newest turns within the budget; anything older is covered by the summary (or about to be)
+        recent, used = [], 0
+        for turn in reversed(self.messages[self.summarized_upto:]):
+            if recent and used + turn["tokens"] > RECENT_TOKEN_BUDGET:
+                break
+            recent.append(turn)
+            used += turn["tokens"]
+        return recent[::-1]
+
+    def build_prompt(self, question):
+        # Stable parts first (persona, case brief, summary) so the prefix repeats across turns
+        earlier = f"Earlier in this conversation (summary):\n{self.summary}\n\n" if self.summary else ""
+        recent = "\n".join(f"{t['role']}: {t['content']}" for t in self._recent())
+        return f"""You are AI Sathi, a compassionate animal welfare assistant.
+
+{self._brief}
+{earlier}Recent chat:
+{recent}
+
+Question: {question}
+
+Respond in a caring, professional manner. Be concise but comprehensive."""
+
+    def compact(self):
+        # Fold the turns that no longer fit the budget into the summary, in the background.
+        # Each fold covers a fixed slice, so the summary is generated once and then reused.
+        if self._fold_job and self._fold_job.pending:
+            return
+        pending = self.messages[self.summarized_upto:]
+        used = sum(t["tokens"] for t in pending)
+        cut = self.summarized_upto
+        for turn in pending:
+            if used <= RECENT_TOKEN_BUDGET:
+                break
+            used -= turn["tokens"]
+            cut += 1
+        if cut > self.summarized_upto:
+            self._fold_job = submit(f"chat-summary:{self.id}:{cut}", _fold,
+                                    (self, cut, self.summary, self.messages[self.summarized_upto:cut]), retry=True)
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from PIL import Image
+
+from storage import recent_case_hashes
+
+# Reports of the same animal at the same place within this window are treated as one incident
+WINDOW_SECONDS = int(os.environ.get("PAWALERT_DEDUP_WINDOW", "1800"))
+# Max differing bits between two 64-bit hashes; must stay below BANDS for the band lookup
+MAX_DISTANCE = 6
+BANDS = 8
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def image_hash(path):
+    # 64-bit difference hash: survives re-encoding, resizing and small crops
+    with Image.open(path) as img:
+        img.draft("L", (64, 64))
+        pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def _bands(phash):
+    return [(i, (phash >> (i * BAND_BITS)) & BAND_MASK) for i in range(BANDS)]
+
+
+class DedupIndex:
+    # Multi-index hash table: two hashes within MAX_DISTANCE bits share at least one
+    # exact 8-bit band (pigeonhole), so a lookup only compares the band collisions
+    def __init__(self, window=WINDOW_SECONDS):
+        self.window = window
+        self._groups = defaultdict(lambda: {"recent": deque(), "bands": defaultdict(list)})
+        self.lock = threading.Lock()
+        self._last_rowid = 0
+
+    def _catch_up(self):
+        # The index follows case_hashes, so cases opened by other replicas are matched as well
+        for row in recent_case_hashes(time.time() - self.window, self._last_rowid):
+            self._insert((row["type"], row["location"], row["animal_type"]),
+                         int(row["phash"], 16), row["case_id"], row["created_at"])
+            self._last_rowid = row["rowid"]
+
+    def _insert(self, group_key, phash, case_id, created_at):
+        group = self._groups[group_key]
+        entry = (phash, case_id, created_at)
+        group["recent"].append(entry)
+        for band in _bands(phash):
+            group["bands"][band].append(entry)
+
+    def _group(self, group_key):
+        self._catch_up()
+        group = self._groups[group_key]
+        self._expire(group, time.time())
+        return group
+
+    def _expire(self, group, now):
+        recent = group["recent"]
+        while recent and now - recent[0][2] > self.window:
+            entry = recent.popleft()
+            for band in _bands(entry[0]):
+                group["bands"][band].remove(entry)
+                if not group["bands"][band]:
+                    del group["bands"][band]
+
+    def find(self, case_type, location, animal_type, phash):
+        # Id of the closest recent case within MAX_DISTANCE bits, or None.
+        # Callers hold `lock` across find() and create_case() so two witnesses can't both open a case.
+        group = self._group((case_type, location, animal_type))
+        best = None
+        for band in _bands(phash):
+            for other, other_case, _ in group["bands"].get(band, ()):
+                distance = bin(phash ^ other).count("1")
+                if distance <= MAX_DISTANCE and (best is None or distance < best[0]):
+                    best = (distance, other_case)
+        return best[1] if best else None
+
+
+dedup_index = DedupIndex()
@@ -0,0 +1,180 @@
+import csv
+import heapq
+import math
+import os
+import threading
+
+from changefeed import change_feed
+from hospitals import APP_DIR, facility
+from spatial import haversine_km
+from storage import active_vehicle_assignments, get_case
+
+FLEET_CSV = os.environ.get("PAWALERT_FLEET_CSV", os.path.join(APP_DIR, "datasets", "fleet.csv"))
+# Grid cell size in degrees (~5.5 km north-south); vehicles are bucketed by cell
+CELL_DEGREES = 0.05
+MAX_RADIUS_KM = 60
+AVERAGE_SPEED_KMH = 25
+DISPATCH_OVERHEAD_MINUTES = 2
+
+
+def eta_minutes(distance_km):
+    return DISPATCH_OVERHEAD_MINUTES + math.ceil(distance_km / AVERAGE_SPEED_KMH * 60)
+
+
+class Vehicle:
+    def __init__(self, vehicle_id, facility_id, driver_name, driver_contact, latitude, longitude):
+        self.id = vehicle_id
+        self.facility_id = facility_id
+        self.driver_name = driver_name
+        self.driver_contact = driver_contact
+        self.latitude = latitude
+        self.longitude = longitude
+        self.case_id = None
+
+    @property
+    def available(self):
+        return self.case_id is None
+
+
+def _cell(lat, lon):
+    return int(math.floor(lat / CELL_DEGREES)), int(math.floor(lon / CELL_DEGREES))
+
+
+class Fleet:
+    # Available vehicles live in a grid; assign() searches rings of cells outward and pops the
+    # nearest candidate from a heap. One lock covers search and booking, so a vehicle is only
+    # ever handed to one case.
+    def __init__(self, vehicles):
+        self.vehicles = {v.id: v for v in vehicles}
+        self._grid = {}
+        self._lock = threading.Lock()
+        for vehicle in vehicles:
+            if vehicle.available:
+                self._add(vehicle)
+
+    def _add(self, vehicle):
+        self._grid.setdefault(_cell(vehicle.latitude, vehicle.longitude), set()).add(vehicle.id)
+
+    def _remove(self, vehicle):
+        cell = _cell(vehicle.latitude, vehicle.longitude)
+        self._grid[cell].discard(vehicle.id)
+        if not self._grid[cell]:
+            del self._grid[cell]
+
+    def _ring(self, center, radius):
+        row, col = center
+        if radius == 0:
+            yield center
+            return
+        for d in range(-radius, radius + 1):
+            yield row - radius, col + d
+            yield row + radius, col + d
+        for d in range(-radius + 1, radius):
+            yield row + d, col - radius
+            yield row + d, col + radius
+
+    def _nearest(self, lat, lon):
+        center = _cell(lat, lon)
+        # A cell spans at least this many km east-west at this latitude (and ~5.5 km north-south)
+        cell_km = CELL_DEGREES * 111.32 * max(math.cos(math.radians(abs(lat) + CELL_DEGREES)), 0.01)
+        candidates = []
+        radius = 0
+        while radius * cell_km <= MAX_RADIUS_KM:
+            for cell in self._ring(center, radius):
+                for vehicle_id in self._grid.get(cell, ()):
+                    vehicle = self.vehicles[vehicle_id]
+                    distance = haversine_km(lat, lon, vehicle.latitude, vehicle.longitude)
+                    heapq.heappush(candidates, (distance, vehicle_id))
+            # Anything in ring r+1 or beyond is at least r * cell_km away
+            if candidates and candidates[0][0] <= radius * cell_km:
+                break
+            radius += 1
+        if candidates and candidates[0][0] <= MAX_RADIUS_KM:
+            return candidates[0]
+        return None
+
+    def assign(self, case_id, lat, lon):
+        # Returns (vehicle, distance_km, eta_minutes), or None when nothing is available in range
+        with self._lock:
+            found = self._nearest(lat, lon)
+            if found is None:
+                return None
+            distance, vehicle_id = found
+            vehicle = self.vehicles[vehicle_id]
+            self._remove(vehicle)
+            vehicle.case_id = case_id
+        return vehicle, round(distance, 2), eta_minutes(distance)
+
+    def release(self, vehicle_id, lat=None, lon=None):
+        # Back in service at (lat, lon), by default at its own hospital
+        with self._lock:
+            vehicle = self.vehicles.get(vehicle_id)
+            if vehicle is None or vehicle.available:
+                return
+            home = facility(vehicle.facility_id)
+            vehicle.latitude = lat if lat is not None else home["latitude"]
+            vehicle.longitude = lon if lon is not None else home["longitude"]
+            vehicle.case_id = None
+            self._add(vehicle)
+
+    def hold(self, vehicle_id, case_id):
+        # Marks a vehicle busy without a search, e.g. when the database says it is already booked
+        with self._lock:
+            vehicle = self.vehicles.get(vehicle_id)
+            if vehicle is not None and vehicle.available:
+                self._remove(vehicle)
+                vehicle.case_id = case_id
+
+    def stats(self):
+        with self._lock:
+            busy = sum(1 for v in self.vehicles.values() if not v.available)
+        return {"vehicles": len(self.vehicles), "busy": busy, "available": len(self.vehicles) - busy}
+
+
+def load_vehicles(path=FLEET_CSV):
+    with open(path, newline="", encoding="utf-8") as f:
+        vehicles = []
+        for row in csv.DictReader(f):
+            home = facility(int(row["facility_id"]))
+            vehicles.append(Vehicle(int(row["vehicle_id"]), home["id"], row["driver_name"], row["driver_contact"],
+                                    home["latitude"], home["longitude"]))
+    return vehicles
+
+
+_fleet = None
+_fleet_lock = threading.Lock()
+
+
+def release_at_hospital(fleet, case, vehicle_id):
+    # The vehicle delivered the animal, so it returns to service at the selected hospital
+    hospital = case.get("selected_hospital") or {}
+    home = facility(hospital["facility_id"]) if hospital.get("facility_id") else None
+    fleet.release(vehicle_id, *((home["latitude"], home["longitude"]) if home else ()))
+
+
+def _sync_case(case_id):
+    # Mirrors a dispatch or a release made by another replica; replaying one is harmless
+    fleet = get_fleet()
+    case = get_case(case_id)
+    if not case or not case.get("vehicle_id"):
+        return
+    if case["released_at"]:
+        release_at_hospital(fleet, case, case["vehicle_id"])
+    else:
+        fleet.hold(case["vehicle_id"], case_id)
+
+
+def get_fleet():
+    # One fleet per process, with vehicles on open dispatches marked busy from the database
+    # and kept in step with other replicas through the change feed
+    global _fleet
+    if _fleet is None:
+        with _fleet_lock:
+            if _fleet is None:
+                change_feed.subscribe(("dispatched", "closed"), _sync_case)
+                vehicles = load_vehicles()
+                busy = active_vehicle_assignments()
+                for vehicle in vehicles:
+                    vehicle.case_id = busy.get(vehicle.id)
+                _fleet = Fleet(vehicles)
+    return _fleet
@@ -0,0 +1,55 @@
+import os
+import threading
+from collections import OrderedDict
+
+MAX_BYTES = int(os.environ.get("PAWALERT_FRAGMENT_CACHE_MB", "32")) * 1024 * 1024
+
+
+class FragmentCache:
+    # Rendered HTML per (case id, fragment name), valid while the case version is unchanged.
+    # Every write to a case bumps its version, so a stale entry is rebuilt and replaced in place.
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def render(self, case, name, build):
+        key = (case["id"], name)
+        version = case["version"]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+        html = build()
+        with self._lock:
+            old = self._entries.get(key)
+            # A session still holding an older copy of the case must not replace a newer entry
+            if old is not None and old[0] > version:
+                return html
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (version, html)
+            self._entries.move_to_end(key)
+            self._bytes += len(html)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats["evictions"] += 1
+        return html
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), kib=round(self._bytes / 1024, 1))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,78 @@
+import csv
+import os
+from datetime import datetime
+from functools import lru_cache
+
+from spatial import KDTree
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+HOSPITALS_CSV = os.environ.get("PAWALERT_HOSPITALS_CSV", os.path.join(APP_DIR, "datasets", "hospitals.csv"))
+LOCATIONS_CSV = os.path.join(APP_DIR, "datasets", "locations.csv")
+
+# Facility levels acceptable for the severity the analysis reported
+LEVELS_FOR_SEVERITY = {
+    "Critical": {"emergency"},
+    "Severe": {"emergency", "surgery"},
+    "Moderate": {"emergency", "surgery", "general"},
+    "Minor": {"emergency", "surgery", "general"},
+    None: {"emergency", "surgery", "general"},
+}
+
+
+def _parse_hours(hours):
+    # "24/7" or comma-separated "HH:MM-HH:MM" ranges -> list of (open, close) minutes
+    if hours == "24/7":
+        return None
+    ranges = []
+    for part in hours.split(","):
+        start, end = part.split("-")
+        ranges.append(tuple(int(t[:2]) * 60 + int(t[3:]) for t in (start, end)))
+    return ranges
+
+
+def is_open(facility, now):
+    if facility["open_ranges"] is None:
+        return True
+    minute = now.hour * 60 + now.minute
+    return any(start <= minute < end for start, end in facility["open_ranges"])
+
+
+@lru_cache(maxsize=1)
+def load_facilities():
+    # Read and index once per process; queries then never touch the file
+    with open(HOSPITALS_CSV, newline="", encoding="utf-8") as f:
+        facilities = [
+            {
+                "id": int(row["id"]), "name": row["name"], "city": row["city"], "contact": row["contact"],
+                "latitude": float(row["latitude"]), "longitude": float(row["longitude"]),
+                "level": row["level"], "speciality": row["speciality"],
+                "fee_min": int(row["fee_min"]), "fee_max": int(row["fee_max"]),
+                "hours": row["hours"], "open_ranges": _parse_hours(row["hours"]),
+            }
+            for row in csv.DictReader(f)
+        ]
+    tree = KDTree([(f["latitude"], f["longitude"]) for f in facilities])
+    return facilities, tree, {f["id"]: f for f in facilities}
+
+
+@lru_cache(maxsize=1)
+def locations():
+    with open(LOCATIONS_CSV, newline="", encoding="utf-8") as f:
+        return {row["name"]: (float(row["latitude"]), float(row["longitude"])) for row in csv.DictReader(f)}
+
+
+def location_coords(name):
+    return locations().get(name, (None, None))
+
+
+def facility(facility_id):
+    return load_facilities()[2].get(facility_id)
+
+
+def nearest_hospitals(lat, lon, k=3, severity=None, now=None):
+    # k nearest facilities that are open now and equipped for the reported severity
+    facilities, tree, _ = load_facilities()
+    now = now or datetime.now()
+    levels = LEVELS_FOR_SEVERITY.get(severity, LEVELS_FOR_SEVERITY[None])
+    accept = lambda i: facilities[i]["level"] in levels and is_open(facilities[i], now)
+    return [dict(facilities[i], distance_km=round(km, 2)) for km, i in tree.nearest(lat, lon, k, accept)]
@@ -0,0 +1,242 @@
+import os
+import threading
+
+import httpx
+from groq import Groq
+
+from response_cache import make_key, response_cache
+from scheduler import estimate_tokens, priority_for, scheduler, severity_of
+from telemetry import count, log_event, span
+
+TEXT_MODEL = "llama-3.3-70b-versatile"
+# Model tiers; a deployment can point them at other models without a code change. Images have
+# one tier by default: a first pass only runs once the large vision model is set to another model.
+VISION_MODEL = os.environ.get("GROQ_VISION_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
+SMALL_TEXT_MODEL = os.environ.get("GROQ_SMALL_TEXT_MODEL", "llama-3.1-8b-instant")
+LARGE_VISION_MODEL = os.environ.get("GROQ_LARGE_VISION_MODEL", VISION_MODEL)
+
+# Per task and tier: (model, max_tokens, temperature). Every task starts on "fast"; tasks with a
+# "full" profile escalate to it for Severe/Critical cases, or when the severity is unclear.
+MODEL_PROFILES = {
+    "analysis": {"fast": (VISION_MODEL, 450, 0.2), "full": (LARGE_VISION_MODEL, 1000, 0.3)},
+    "bulk": {"fast": (VISION_MODEL, 450, 0.2), "full": (LARGE_VISION_MODEL, 1000, 0.3)},
+    "dispatch": {"fast": (SMALL_TEXT_MODEL, 450, 0.5), "full": (TEXT_MODEL, 800, 0.5)},
+    "police": {"fast": (SMALL_TEXT_MODEL, 450, 0.4), "full": (TEXT_MODEL, 800, 0.4)},
+    "chat": {"fast": (SMALL_TEXT_MODEL, 500, 0.7), "full": (TEXT_MODEL, 800, 0.7)},
+    # Statute numbers and penalties need the large model; the answers are cached for a week
+    "legal": {"fast": (TEXT_MODEL, 600, 0.2)},
+    "first_aid": {"fast": (SMALL_TEXT_MODEL, 500, 0.3)},
+    "summary": {"fast": (SMALL_TEXT_MODEL, 300, 0.2)},
+}
+URGENT_SEVERITIES = ("Severe", "Critical")
+# For case work a missing severity (analysis pending or unparsed) is treated as possibly urgent
+CASE_CATEGORIES = ("analysis", "bulk", "dispatch", "police")
+# Image analyses whose first pass is kept as the answer unless it rates the case urgent
+TRIAGE_CATEGORIES = ("analysis", "bulk")
+
+# Connection pool settings, overridable per deployment
+POOL_SIZE = int(os.environ.get("GROQ_POOL_SIZE", "20"))
+CONNECT_TIMEOUT = float(os.environ.get("GROQ_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("GROQ_READ_TIMEOUT", "60"))
+KEEPALIVE_EXPIRY = float(os.environ.get("GROQ_KEEPALIVE_EXPIRY", "120"))
+# Retries are left to the scheduler, which honours rate-limit headers and priorities
+MAX_RETRIES = int(os.environ.get("GROQ_MAX_RETRIES", "0"))
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+
+def _build_client(api_key):
+    timeout = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=POOL_SIZE,
+            max_keepalive_connections=POOL_SIZE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=timeout,
+    )
+    return Groq(api_key=api_key, http_client=http_client, timeout=timeout, max_retries=MAX_RETRIES)
+
+
+def get_client(api_key=None):
+    # One client per process; httpx.Client is thread-safe so every session shares it
+    global _client, _client_key
+    api_key = api_key or _client_key or os.environ.get("GROQ_API_KEY")
+    if _client is not None and api_key == _client_key:
+        return _client
+    with _client_lock:
+        if _client is None or api_key != _client_key:
+            _client = _build_client(api_key)
+            _client_key = api_key
+        return _client
+
+
+def route(category, severity=None, image_data=None):
+    # Returns (tier, reason, profile) for a request answered in one pass
+    profiles = MODEL_PROFILES.get(category, MODEL_PROFILES["chat"])
+    if "full" not in profiles:
+        tier, reason = "fast", "single_tier"
+    elif severity in URGENT_SEVERITIES:
+        tier, reason = "full", "urgent"
+    elif severity is None and category in CASE_CATEGORIES:
+        tier, reason = "full", "unclear"
+    else:
+        tier, reason = "fast", "routine"
+    model, max_tokens, temperature = profiles[tier]
+    if image_data and model not in (VISION_MODEL, LARGE_VISION_MODEL):
+        model = VISION_MODEL
+    return tier, reason, (model, max_tokens, temperature)
+
+
+def _log_route(category, tier, reason, model):
+    # Paired with the inference span's model/tier labels and token counters, this shows how
+    # much traffic each tier takes and what it costs
+    count("model_route", category=category or "none", tier=tier, reason=reason, model=model)
+    log_event("model_route", category=category, tier=tier, reason=reason, model=model)
+
+
+def _create_completion(prompt, image_data, priority, profile, stream=False):
+    client = get_client()
+    model, max_tokens, temperature = profile
+    if image_data:
+        # A list of images (video keyframes) is sent as one batched request
+        images = image_data if isinstance(image_data, list) else [image_data]
+        content = [{"type": "text", "text": prompt}] + [
+            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image}"}}
+            for image in images
+        ]
+    else:
+        images = []
+        content = prompt
+    return scheduler.call(
+        lambda: client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=[{"role": "user", "content": content}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=stream
+        ),
+        priority,
+        estimate_tokens(prompt, len(images), max_tokens),
+    )
+
+
+def _cache_key(prompt, image_data, cache_key, model):
+    # `cache_key` lets callers key on the part of the prompt that decides the answer
+    return make_key(model, cache_key or prompt, image_data)
+
+
+def _record_usage(tags, usage, prompt, text):
+    # Provider usage when reported, otherwise the ~4 characters per token estimate
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or len(prompt) // 4
+    completion_tokens = getattr(usage, "completion_tokens", None) or len(text) // 4
+    tags["prompt_tokens"] = prompt_tokens
+    tags["completion_tokens"] = completion_tokens
+    count("inference_tokens", prompt_tokens, model=tags["model"], kind="prompt")
+    count("inference_tokens", completion_tokens, model=tags["model"], kind="completion")
+
+
+def _triage(prompt, image_data, category, priority):
+    # Short first pass on the fast vision profile. Its answer stands for Minor/Moderate cases;
+    # anything urgent, unrated or cut short is redone on the full profile.
+    profile = MODEL_PROFILES[category]["fast"]
+    with span("inference", model=profile[0], category=category, tier="fast", stream="no") as tags:
+        response = _create_completion(prompt, image_data, priority, profile)
+        choice = response.choices[0]
+        text = choice.message.content
+        _record_usage(tags, getattr(response, "usage", None), prompt, text)
+    severity = severity_of(text)
+    if getattr(choice, "finish_reason", None) == "length":
+        reason = "truncated"
+    elif severity is None:
+        reason = "unclear"
+    elif severity in URGENT_SEVERITIES:
+        reason = "urgent"
+    else:
+        _log_route(category, "fast", "triage_" + severity.lower(), profile[0])
+        return text, None
+    full = MODEL_PROFILES[category]["full"]
+    _log_route(category, "full", reason, full[0])
+    return text, full
+
+
+def _plan(prompt, image_data, category, severity, priority):
+    # Returns (text, tier, None) when the first pass already answered, else (None, tier, profile)
+    if image_data and category in TRIAGE_CATEGORIES:
+        profiles = MODEL_PROFILES[category]
+        # With one vision model for both tiers a first pass would only repeat the request
+        if profiles["fast"][0] == profiles["full"][0]:
+            _log_route(category, "full", "single_pass", profiles["full"][0])
+            return None, "full", profiles["full"]
+        text, profile = _triage(prompt, image_data, category, priority)
+        return (text, "fast", None) if profile is None else (None, "full", profile)
+    tier, reason, profile = route(category, severity, image_data)
+    _log_route(category, tier, reason, profile[0])
+    return None, tier, profile
+
+
+def stream_completion(prompt, image_data=None, category=None, cache_key=None, priority=None, severity=None):
+    # Yields text deltas; errors propagate to the caller. A cached or triaged reply arrives as one chunk.
+    # `severity` is the case's current rating, used to pick the model tier.
+    _, _, profile = route(category, severity, image_data)
+    key = _cache_key(prompt, image_data, cache_key, profile[0])
+    cached = response_cache.get(category, key)
+    if cached is not None:
+        yield cached
+        return
+    if priority is None:
+        priority = priority_for(category, severity)
+    text, tier, profile = _plan(prompt, image_data, category, severity, priority)
+    if profile is None:
+        yield text
+        return
+    text = ""
+    usage = None
+    with span("inference", model=profile[0], category=category or "none", tier=tier, stream="yes") as tags:
+        for chunk in _create_completion(prompt, image_data, priority, profile, stream=True):
+            # Groq reports usage on the final chunk under x_groq
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                text += chunk.choices[0].delta.content
+                yield chunk.choices[0].delta.content
+        _record_usage(tags, usage, prompt, text)
+    response_cache.put(category, key, text)
+
+
+def complete(prompt, image_data=None, category=None, cache_key=None, priority=None, severity=None):
+    _, _, profile = route(category, severity, image_data)
+    key = _cache_key(prompt, image_data, cache_key, profile[0])
+    cached = response_cache.get(category, key)
+    if cached is not None:
+        return cached
+    if priority is None:
+        priority = priority_for(category, severity)
+    text, tier, profile = _plan(prompt, image_data, category, severity, priority)
+    if profile is None:
+        return text
+    with span("inference", model=profile[0], category=category or "none", tier=tier, stream="no") as tags:
+        response = _create_completion(prompt, image_data, priority, profile)
+        text = response.choices[0].message.content
+        _record_usage(tags, getattr(response, "usage", None), prompt, text)
+    response_cache.put(category, key, text)
+    return text
+
+
+def _stream_with_fallback(prompt, image_data, category, cache_key, severity):
+    try:
+        yield from stream_completion(prompt, image_data, category, cache_key, severity=severity)
+    except Exception as e:
+        yield f"Analysis error: {str(e)}"
+
+
+def analyze_with_groq(prompt, image_data=None, stream=False, category=None, cache_key=None, severity=None):
+    # With stream=True a generator of text deltas is returned instead of the full text.
+    # Errors are returned as text and never cached.
+    if stream:
+        return _stream_with_fallback(prompt, image_data, category, cache_key, severity)
+    try:
+        return complete(prompt, image_data, category, cache_key, severity=severity)
+    except Exception as e:
+        return f"Analysis error: {str(e)}"
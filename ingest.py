@@ -0,0 +1,185 @@
+import argparse
+import csv
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from hospitals import locations
+from pipeline import ABUSE_TYPES, ANIMAL_TYPES, analyze_case, register_abuse, register_injury, store_upload
+from scheduler import scheduler, severity_of
+from storage import get_case
+
+REQUIRED_COLUMNS = ("photo", "animal_type", "location", "description")
+CASE_TYPES = ("Injury", "Abuse")
+# Statuses that need no more work when a run is resumed
+FINISHED = ("done", "linked")
+PROGRESS_SECONDS = 10
+# This process has its own scheduler and cannot see the app's queue, so it keeps well under the
+# app's GROQ_MAX_IN_FLIGHT (default 8) to leave the shared quota to interactive users
+BULK_MAX_IN_FLIGHT = 2
+
+
+def row_key(row):
+    # Identifies a manifest row across runs, even if rows are added or reordered
+    return hashlib.sha256(json.dumps(row, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def load_checkpoint(path):
+    # Latest record per row key. A line cut short by a killed run is ignored and redone.
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record["key"]] = record
+    return records
+
+
+class Results:
+    # Append-only JSONL that doubles as the checkpoint; every line is on disk before the next step
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+    def write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if record["status"] != "registered":
+                self.counts[record["status"]] += 1
+
+    def close(self):
+        self._file.close()
+
+
+def _store(path, kind):
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    with open(path, "rb") as f:
+        return store_upload(f, content_type, kind)
+
+
+def register_row(row, photos_dir, default_type):
+    # Same choices and registration path as the report forms and the API, minus the background analysis
+    case_type = (row.get("type") or default_type).strip().capitalize()
+    if case_type not in CASE_TYPES:
+        raise ValueError(f"unknown case type {case_type!r}")
+    if row["animal_type"] not in ANIMAL_TYPES:
+        raise ValueError(f"unknown animal_type {row['animal_type']!r}")
+    if row["location"] not in locations():
+        raise ValueError(f"unknown location {row['location']!r}")
+    if not row["description"].strip():
+        raise ValueError("empty description")
+    abuse_type = row.get("abuse_type") or "Other"
+    if case_type == "Abuse" and abuse_type not in ABUSE_TYPES:
+        raise ValueError(f"unknown abuse_type {abuse_type!r}")
+    evidence = _store(os.path.join(photos_dir, row["photo"]), "image")
+    if case_type == "Injury":
+        return register_injury(row["animal_type"], row["location"], row["description"], evidence, analyze=False)
+    if row.get("culprit_photo"):
+        evidence.update(_store(os.path.join(photos_dir, row["culprit_photo"]), "culprit"))
+    return register_abuse(row["animal_type"], abuse_type, row["location"], row["description"], evidence,
+                          analyze=False)
+
+
+def process_row(number, row, previous, photos_dir, default_type, results):
+    record = {"row": number, "key": row_key(row), "photo": row["photo"]}
+    case_id = previous.get("case_id") if previous else None
+    linked = bool(case_id and previous["linked"])
+    try:
+        if not case_id:
+            case_id, linked = register_row(row, photos_dir, default_type)
+            results.write(dict(record, status="registered", case_id=case_id, linked=linked))
+        if linked:
+            # Attached to an earlier case as a witness report; that case has its own analysis
+            results.write(dict(record, status="linked", case_id=case_id, linked=True))
+            return
+        # A run killed after the analysis was saved should not pay for it twice
+        analysis = get_case(case_id)["analysis"] or analyze_case(case_id, "bulk")
+        results.write(dict(record, status="done", case_id=case_id, linked=False, severity=severity_of(analysis)))
+    except Exception as e:
+        results.write(dict(record, status="failed", case_id=case_id, linked=linked, error=str(e)))
+
+
+def ingest(manifest, photos_dir, results_path, default_type="Injury", concurrency=4):
+    # Streams the manifest; at most 2x concurrency rows are held in memory at once
+    checkpoint = load_checkpoint(results_path)
+    results = Results(results_path)
+    skipped = 0
+    started = time.perf_counter()
+    last_progress = started
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="pawalert-ingest")
+    pending = set()
+    try:
+        with open(manifest, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or ())]
+            if missing:
+                raise SystemExit(f"{manifest}: missing columns {', '.join(missing)}")
+            for number, row in enumerate(reader, 1):
+                previous = checkpoint.get(row_key(row))
+                if previous and previous["status"] in FINISHED:
+                    skipped += 1
+                    continue
+                while len(pending) >= concurrency * 2:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(pool.submit(process_row, number, row, previous, photos_dir, default_type, results))
+                if time.perf_counter() - last_progress > PROGRESS_SECONDS:
+                    last_progress = time.perf_counter()
+                    print(f"row {number}: {dict(results.counts)}", file=sys.stderr)
+        wait(pending)
+    except KeyboardInterrupt:
+        print("interrupted; run the same command again to resume", file=sys.stderr)
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise SystemExit(130)
+    finally:
+        pool.shutdown(wait=True)
+        results.close()
+    elapsed = time.perf_counter() - started
+    processed = sum(results.counts.values())
+    return {
+        "manifest": manifest,
+        "results": results_path,
+        "skipped": skipped,
+        **{status: results.counts[status] for status in ("done", "linked", "failed")},
+        "seconds": round(elapsed, 1),
+        "rows_per_minute": round(processed / elapsed * 60, 1) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Register a partner's batch of reports and analyse them")
+    parser.add_argument("manifest", help="CSV with columns photo, animal_type, location, description and "
+                                         "optionally type, abuse_type, culprit_photo")
+    parser.add_argument("--photos", help="folder the photo paths are relative to (default: the manifest's folder)")
+    parser.add_argument("--results", help="JSONL results and checkpoint file (default: <manifest>.results.jsonl)")
+    parser.add_argument("--type", choices=CASE_TYPES, default="Injury", help="case type for rows without one")
+    parser.add_argument("--concurrency", type=int, default=4, help="rows registered and analysed at once")
+    parser.add_argument("--max-in-flight", type=int, default=BULK_MAX_IN_FLIGHT,
+                        help="model requests running at once from this process")
+    args = parser.parse_args()
+    if not os.environ.get("GROQ_API_KEY"):
+        parser.error("GROQ_API_KEY is not set")
+    scheduler.max_in_flight = args.max_in_flight
+
+    photos_dir = args.photos or os.path.dirname(os.path.abspath(args.manifest))
+    results_path = args.results or f"{os.path.splitext(args.manifest)[0]}.results.jsonl"
+    report = ingest(args.manifest, photos_dir, results_path, args.type, args.concurrency)
+    print(json.dumps(report, indent=2))
+    if report["failed"]:
+        raise SystemExit(f"{report['failed']} rows failed; run again to retry them")
+
+
+if __name__ == "__main__":
+    main()
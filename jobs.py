@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+MAX_WORKERS = int(os.environ.get("PAWALERT_AI_WORKERS", "4"))
+# Finished jobs are kept this long so every open session can pick up the result
+RETENTION_SECONDS = 3600
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        self.state = QUEUED
+        self.partial = ""
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def pending(self):
+        return self.state in (QUEUED, RUNNING)
+
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="pawalert-ai")
+_jobs = {}
+_lock = threading.Lock()
+
+
+def _prune(now):
+    expired = [key for key, job in _jobs.items() if job.finished_at and now - job.finished_at > RETENTION_SECONDS]
+    for key in expired:
+        del _jobs[key]
+
+
+def _run(job, fn, args):
+    job.state = RUNNING
+    try:
+        job.result = fn(job, *args)
+        job.state = DONE
+    except Exception as e:
+        job.error = str(e)
+        job.state = FAILED
+    finally:
+        job.finished_at = time.time()
+
+
+def submit(key, fn, args=(), retry=False):
+    # One job per key, so reruns and other sessions attach to the same work. A failed job
+    # is only replaced when retry=True. `fn(job, *args)` may stream into job.partial.
+    with _lock:
+        _prune(time.time())
+        job = _jobs.get(key)
+        if job is not None and not (retry and job.state == FAILED):
+            return job
+        job = Job(key)
+        _jobs[key] = job
+    _executor.submit(_run, job, fn, args)
+    return job
+
+
+def get_job(key):
+    return _jobs.get(key)
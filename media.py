@@ -0,0 +1,94 @@
+import heapq
+import io
+
+import cv2
+from PIL import Image, ImageOps
+
+# Tuned for llama-4-scout: larger inputs cost latency without improving the analysis
+MODEL_MAX_SIDE = 1024
+MODEL_JPEG_QUALITY = 80
+THUMB_MAX_SIDE = 480
+THUMB_JPEG_QUALITY = 70
+ICON_MAX_SIDE = 96
+
+# Video sampling: the vision model accepts at most 5 images per request
+KEYFRAME_LIMIT = 4
+SAMPLE_INTERVAL_SECONDS = 1.0
+MAX_SAMPLES = 60
+
+
+def _to_jpeg(img, max_side, quality):
+    out = img.copy()
+    out.thumbnail((max_side, max_side), Image.LANCZOS)
+    buf = io.BytesIO()
+    # Saving without exif= drops EXIF/GPS and other metadata
+    out.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def preprocess_image(source):
+    # `source` is a path or file object; decode once and derive every variant.
+    # Raises UnidentifiedImageError for non-images.
+    with Image.open(source) as img:
+        img.draft("RGB", (MODEL_MAX_SIDE, MODEL_MAX_SIDE))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+    return {
+        "model": _to_jpeg(img, MODEL_MAX_SIDE, MODEL_JPEG_QUALITY),
+        "thumbnail": _to_jpeg(img, THUMB_MAX_SIDE, THUMB_JPEG_QUALITY),
+        "icon": _to_jpeg(img, ICON_MAX_SIDE, THUMB_JPEG_QUALITY),
+    }
+
+
+def _frame_to_image(frame):
+    return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+def _frame_histogram(frame):
+    small = cv2.cvtColor(cv2.resize(frame, (64, 64)), cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([small], [0, 1], None, [16, 16], [0, 180, 0, 256])
+    return cv2.normalize(hist, hist)
+
+
+def extract_keyframes(path, limit=KEYFRAME_LIMIT):
+    # Walk the container once, decoding only sampled frames, and keep the `limit`
+    # frames with the largest scene change; memory stays bounded by `limit` frames
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError("Could not open video")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        step = max(1, int(fps * SAMPLE_INTERVAL_SECONDS), total // MAX_SAMPLES)
+
+        kept = []
+        prev_hist = None
+        index = 0
+        while cap.grab():
+            if index % step == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    hist = _frame_histogram(frame)
+                    # The first frame always scores 1.0 so short clips still yield a frame
+                    score = 1.0 if prev_hist is None else cv2.compareHist(prev_hist, hist, cv2.HISTCMP_BHATTACHARYYA)
+                    prev_hist = hist
+                    item = (score, index, _frame_to_image(frame))
+                    if len(kept) < limit:
+                        heapq.heappush(kept, item)
+                    elif score > kept[0][0]:
+                        heapq.heapreplace(kept, item)
+            index += 1
+    finally:
+        cap.release()
+
+    if not kept:
+        raise ValueError("No decodable frames in video")
+    return [img for _, _, img in sorted(kept, key=lambda item: item[1])]
+
+
+def preprocess_video(path):
+    frames = extract_keyframes(path)
+    return {
+        "frames": [_to_jpeg(img, MODEL_MAX_SIDE, MODEL_JPEG_QUALITY) for img in frames],
+        "thumbnail": _to_jpeg(frames[0], THUMB_MAX_SIDE, THUMB_JPEG_QUALITY),
+        "icon": _to_jpeg(frames[0], ICON_MAX_SIDE, THUMB_JPEG_QUALITY),
+    }
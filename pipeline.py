@@ -0,0 +1,347 @@
+import base64
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from blobs import blob_path, open_blob, put_blob, put_blob_stream
+from dedup import dedup_index, image_hash
+from inference import stream_completion
+from jobs import FAILED, Job, get_job, submit
+from fleet import get_fleet, release_at_hospital
+from hospitals import facility, location_coords, nearest_hospitals
+from media import preprocess_image, preprocess_video
+from scheduler import priority_for, severity_of
+from storage import (claim_analysis, close_case, create_case, dispatch_ambulance, fail_analysis, get_case, link_report,
+                     next_sequence, set_analysis, set_dispatch_message, set_hospitals, set_police_message,
+                     unanalysed_cases)
+from telemetry import span
+
+
+def store_upload(fileobj, content_type, kind):
+    # Writes the untouched upload plus its model input, thumbnail and list icon to the blob store.
+    # Videos get one model input per sampled keyframe.
+    media = "video" if content_type.startswith("video/") else "image"
+    with span("upload.store", kind=kind, media=media):
+        evidence = {kind: put_blob_stream(fileobj)}
+    with span("upload.preprocess", kind=kind, media=media) as tags:
+        tags["bytes"] = os.path.getsize(blob_path(evidence[kind]))
+        if media == "video":
+            variants = preprocess_video(blob_path(evidence[kind]))
+        else:
+            variants = preprocess_image(blob_path(evidence[kind]))
+    if media == "video":
+        for i, frame in enumerate(variants["frames"]):
+            evidence[f"{kind}_frame_{i}"] = put_blob(frame)
+    else:
+        evidence[f"{kind}_model"] = put_blob(variants["model"])
+    evidence[f"{kind}_thumb"] = put_blob(variants["thumbnail"])
+    evidence[f"{kind}_icon"] = put_blob(variants["icon"])
+    return evidence
+
+
+def blob_base64(sha):
+    with open_blob(sha) as view:
+        return base64.b64encode(view).decode('utf-8')
+
+
+def model_inputs(evidence, kind="image"):
+    frames = sorted((k for k in evidence if k.startswith(f"{kind}_frame_")), key=lambda k: int(k.rsplit("_", 1)[1]))
+    with span("image.encode", frames=len(frames) or 1):
+        if frames:
+            return [blob_base64(evidence[k]) for k in frames]
+        return blob_base64(evidence[f"{kind}_model"])
+
+
+def media_note(model_data):
+    if isinstance(model_data, list):
+        return f"\n\nThe images are {len(model_data)} keyframes sampled in order from a video of the incident."
+    return ""
+
+
+def injury_prompt(case):
+    return f"""Analyze this animal injury. Animal: {case['animal_type']}, Location: {case['location']}, Description: {case['description']}
+
+Provide:
+1. Severity Level (Minor/Moderate/Severe/Critical)
+2. Visible Injuries
+3. Immediate Care Required
+4. Recovery Time
+
+Be concise and professional."""
+
+
+def abuse_prompt(case):
+    return f"""Analyze this animal abuse case. Animal: {case['animal_type']}, Abuse: {case['abuse_type']}, Location: {case['location']}, Description: {case['description']}
+
+Provide:
+1. Severity Assessment
+2. Immediate Action Needed
+3. Legal Recommendations
+4. Animal Care Suggestions
+
+Be concise and actionable."""
+
+
+def dispatch_prompt(case):
+    return f"""You are a compassionate emergency dispatcher for animal rescue. An ambulance has been dispatched for an injured {case['animal_type']}.
+
+Hospital: {case['selected_hospital']['name']}
+Location: {case['location']}
+Driver: {case['driver_name']}
+Contact: {case['driver_contact']}
+Injury: {case['description']}
+
+Provide actionable guidance:
+1. Help is arriving in about {case['eta_minutes'] or 15} minutes
+2. What to do RIGHT NOW to reduce pain
+3. What NOT to do
+4. Reassurance
+
+Use bullet points."""
+
+
+def police_prompt(case):
+    return f"""You are a police dispatcher handling animal abuse. Case registered.
+
+Case ID: {case['id']}
+FIR: {case['fir_number']}
+Animal: {case['animal_type']}
+Abuse: {case['abuse_type']}
+Location: {case['location']}
+Description: {case['description']}
+
+Provide:
+1. Police notified, FIR filed confirmation
+2. Team arrival time (10-20 minutes)
+3. Immediate actions being taken
+4. What reporter should do (preserve evidence, ensure safety)
+5. Legal process next steps
+6. Reassurance
+
+Use bullet points."""
+
+
+DISPATCH_ATTEMPTS = 5
+
+# Choices offered by the report forms and accepted by the intake API
+ANIMAL_TYPES = ("Dog", "Cat", "Cow", "Horse", "Bird", "Buffalo", "Goat", "Other")
+ABUSE_TYPES = ("Physical Abuse", "Neglect", "Abandonment", "Cruelty", "Illegal Trade", "Torture", "Illegal Slaughter",
+               "Other")
+EVIDENCE_EXTENSIONS = ("jpg", "jpeg", "png", "mp4", "mov")
+CULPRIT_EXTENSIONS = ("jpg", "jpeg", "png")
+
+LEGAL_TERMS = re.compile(r"\b(ipc|428|429|pca act|prevention of cruelty|animal (welfare |cruelty )?laws?|legal|"
+                         r"section 4(28|29)|punishment)\b")
+FIRST_AID_TERMS = re.compile(r"\b(first aid|bleeding|wounds?|burns?|fractures?|poison\w*|heat ?stroke|choking|bandage)\b")
+
+
+def chat_category(question):
+    # General legal/first-aid questions are answered the same for everyone and can be cached
+    text = question.casefold()
+    if LEGAL_TERMS.search(text):
+        return "legal"
+    if FIRST_AID_TERMS.search(text):
+        return "first_aid"
+    return "chat"
+
+
+def recommend_hospitals(latitude, longitude, severity=None):
+    if latitude is None:
+        return []
+    return [
+        {"name": h["name"], "location": f"{h['distance_km']:.1f} km away, {h['city']}",
+         "availability": "Open 24/7" if h["hours"] == "24/7" else f"Open now ({h['hours']})",
+         "contact": h["contact"], "fees": f"₹{h['fee_min']:,} - ₹{h['fee_max']:,}",
+         "speciality": h["speciality"], "facility_id": h["id"], "distance_km": h["distance_km"]}
+        for h in nearest_hospitals(latitude, longitude, severity=severity)
+    ]
+
+
+def _stream_into(job, prompt, image_data=None, category=None, case=None):
+    # Case work is scheduled by category and by the severity the analysis gave the animal
+    severity = severity_of(case and case.get("analysis"))
+    priority = priority_for(category, severity)
+    for chunk in stream_completion(prompt, image_data, category, priority=priority, severity=severity):
+        job.partial += chunk
+    return job.partial
+
+
+def _run_analysis(job, case_id, category="analysis"):
+    case = get_case(case_id)
+    analysis = None
+    try:
+        model_data = model_inputs(case['evidence'])
+        prompt = injury_prompt(case) if case['type'] == 'Injury' else abuse_prompt(case)
+        analysis = _stream_into(job, prompt + media_note(model_data), model_data, category, case)
+        set_analysis(case_id, analysis)
+        return analysis
+    except Exception as e:
+        fail_analysis(case_id, str(e))
+        raise
+    finally:
+        # Hospitals are picked for the severity the analysis reports. A failed analysis leaves
+        # any-level ones, which a successful retry replaces.
+        if case['type'] == 'Injury':
+            set_hospitals(case_id, recommend_hospitals(case['latitude'], case['longitude'], severity_of(analysis)),
+                          replace=analysis is not None)
+
+
+def _run_dispatch_message(job, case_id):
+    case = get_case(case_id)
+    message = _stream_into(job, dispatch_prompt(case), category="dispatch", case=case)
+    set_dispatch_message(case_id, message)
+    return message
+
+
+def _run_police_message(job, case_id):
+    case = get_case(case_id)
+    message = _stream_into(job, police_prompt(case), category="police", case=case)
+    set_police_message(case_id, message)
+    return message
+
+
+def start_analysis(case_id, retry=False):
+    # Returns None while another process is analysing the case; its result arrives through the
+    # database. A failure stored by any process is reported until retry=True.
+    key = f"{case_id}:analysis"
+    job = get_job(key)
+    if job is not None and not (retry and job.state == FAILED):
+        return job
+    error = get_case(case_id)["analysis_error"]
+    if error and not retry:
+        job = Job(key)
+        job.state, job.error = FAILED, error
+        return job
+    if not claim_analysis(case_id):
+        return None
+    return submit(key, _run_analysis, (case_id,), retry=retry)
+
+
+def analyze_case(case_id, category="analysis"):
+    # Runs the analysis in the calling thread; batch imports pass "bulk" so they queue behind users
+    if not claim_analysis(case_id):
+        raise RuntimeError("the case is being analysed by another process")
+    return _run_analysis(Job(f"{case_id}:{category}"), case_id, category)
+
+
+_resumed = False
+_resume_lock = threading.Lock()
+
+
+def resume_analyses():
+    # Once per process: restarts the analyses a restart or a crashed process left without a result
+    global _resumed
+    with _resume_lock:
+        if _resumed:
+            return []
+        _resumed = True
+    return [case_id for case_id in unanalysed_cases() if start_analysis(case_id) is not None]
+
+
+def start_dispatch_message(case_id, retry=False):
+    return submit(f"{case_id}:dispatch", _run_dispatch_message, (case_id,), retry=retry)
+
+
+def start_police_message(case_id, retry=False):
+    return submit(f"{case_id}:police", _run_police_message, (case_id,), retry=retry)
+
+
+def _assign_numbers(case):
+    # Numbers come from shared database sequences, so no two sessions or replicas issue the same one
+    if case["type"] == "Injury":
+        case["id"] = f"INJ{next_sequence('injury')}"
+    else:
+        case["id"] = f"ABU{next_sequence('abuse')}"
+        case["fir_number"] = f"FIR/{datetime.now().year}/ANM/{next_sequence('fir')}"
+
+
+def _register(case, evidence, analyze=True):
+    # Returns (case_id, linked). A near-duplicate of a recent case at the same place is
+    # attached to it as a witness report instead of opening a case and a new analysis.
+    phash = image_hash(blob_path(evidence["image_thumb"]))
+    with dedup_index.lock:
+        existing = dedup_index.find(case["type"], case["location"], case["animal_type"], phash)
+        if existing:
+            link_report(existing, case["description"], case["timestamp"], evidence)
+            return existing, True
+        _assign_numbers(case)
+        create_case(case, evidence=evidence, phash=(f"{phash:016x}", time.time()))
+    if analyze:
+        start_analysis(case["id"])
+    return case["id"], False
+
+
+def _incident_position(case, hospital_id):
+    # Older cases have no coordinates; fall back to the chosen hospital's position
+    if case['latitude'] is not None:
+        return case['latitude'], case['longitude']
+    hospital = next((h for h in case['hospitals'] if h['id'] == hospital_id), None)
+    home = facility(hospital['facility_id']) if hospital and hospital['facility_id'] else None
+    return (home['latitude'], home['longitude']) if home else (None, None)
+
+
+def dispatch_case(case_id, hospital_id):
+    # Books the nearest free ambulance and returns its ETA in minutes, or None if none is in range.
+    # A second press for the same case keeps the first booking.
+    case = get_case(case_id)
+    if case.get('selected_hospital'):
+        return case['eta_minutes']
+    latitude, longitude = _incident_position(case, hospital_id)
+    if latitude is None:
+        return None
+    fleet = get_fleet()
+    for _ in range(DISPATCH_ATTEMPTS):
+        assigned = fleet.assign(case_id, latitude, longitude)
+        if assigned is None:
+            return None
+        vehicle, _, eta = assigned
+        try:
+            dispatch_ambulance(case_id, hospital_id, vehicle.driver_name, vehicle.driver_contact,
+                               datetime.now().strftime("%Y-%m-%d %H:%M:%S"), vehicle.id, eta)
+        except sqlite3.IntegrityError:
+            dispatched = get_case(case_id)
+            if dispatched.get('selected_hospital'):
+                fleet.release(vehicle.id, vehicle.latitude, vehicle.longitude)
+                return dispatched['eta_minutes']
+            # Booked by another process sharing the database: leave it held here and try the next one
+            continue
+        start_dispatch_message(case_id)
+        return eta
+    return None
+
+
+def close_injury_case(case_id):
+    # The ambulance has delivered the animal, so it returns to service at that hospital
+    case = get_case(case_id)
+    vehicle_id = close_case(case_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    if vehicle_id:
+        release_at_hospital(get_fleet(), case, vehicle_id)
+
+
+def register_injury(animal_type, location, description, evidence, analyze=True):
+    # The case is stored before any model call, so a slow or failing model never loses a report.
+    # Hospitals are recommended once the analysis has rated the injury.
+    latitude, longitude = location_coords(location)
+    case = {
+        "type": "Injury", "animal_type": animal_type,
+        "location": location, "latitude": latitude, "longitude": longitude, "description": description,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "analysis": None, "status": "Case Registered"
+    }
+    return _register(case, evidence, analyze)
+
+
+def register_abuse(animal_type, abuse_type, location, description, evidence, analyze=True):
+    latitude, longitude = location_coords(location)
+    case = {
+        "type": "Abuse", "animal_type": animal_type,
+        "abuse_type": abuse_type, "location": location, "latitude": latitude, "longitude": longitude,
+        "description": description,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "analysis": None, "culprit_photo": "Provided" if "culprit" in evidence else "Not Provided",
+        "status": "Case Registered"
+    }
+    return _register(case, evidence, analyze)
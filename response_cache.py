@@ -0,0 +1,88 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.environ.get("PAWALERT_LLM_CACHE_SIZE", "512"))
+
+# Seconds a reply stays valid per category; 0 disables caching. Case analysis and
+# case-specific chat are never reused, general legal/first-aid answers live longest.
+CATEGORY_TTLS = {
+    "legal": 7 * 24 * 3600,
+    "first_aid": 7 * 24 * 3600,
+    "dispatch": 15 * 60,
+    "police": 15 * 60,
+    "analysis": 0,
+    "chat": 0,
+}
+
+
+def normalize_prompt(prompt):
+    return " ".join(prompt.split()).casefold()
+
+
+def make_key(model, prompt, image_data=None):
+    digest = hashlib.sha256()
+    digest.update(model.encode())
+    digest.update(b"\0")
+    digest.update(normalize_prompt(prompt).encode())
+    images = image_data if isinstance(image_data, list) else [image_data] if image_data else []
+    for image in images:
+        digest.update(b"\0")
+        digest.update(hashlib.sha256(image.encode()).digest())
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=MAX_ENTRIES, ttls=CATEGORY_TTLS):
+        self.max_entries = max_entries
+        self.ttls = ttls
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, category, name):
+        counts = self._stats.setdefault(category, {"hits": 0, "misses": 0, "evictions": 0, "expired": 0})
+        counts[name] += 1
+
+    def ttl(self, category):
+        return self.ttls.get(category, 0)
+
+    def get(self, category, key):
+        if not self.ttl(category):
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self._count(category, "expired")
+                entry = None
+            if entry is None:
+                self._count(category, "misses")
+                return None
+            self._entries.move_to_end(key)
+            self._count(category, "hits")
+            return entry[1]
+
+    def put(self, category, key, text):
+        ttl = self.ttl(category)
+        if not ttl:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, text, category)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                _, (_, _, evicted_category) = self._entries.popitem(last=False)
+                self._count(evicted_category, "evictions")
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "categories": {c: dict(s) for c, s in self._stats.items()}}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,182 @@
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+
+import groq
+
+from telemetry import observe
+
+MAX_IN_FLIGHT = int(os.environ.get("GROQ_MAX_IN_FLIGHT", "8"))
+DEADLINE_SECONDS = float(os.environ.get("GROQ_DEADLINE", "120"))
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+# Lower runs first. Case work beats chat, and batch imports wait for everyone; within case work
+# the worse the animal, the sooner.
+CATEGORY_PRIORITY = {"dispatch": 10, "analysis": 10, "police": 20, "legal": 40, "first_aid": 40, "chat": 40,
+                     "summary": 50, "bulk": 60}
+SEVERITY_BOOST = {"Critical": 8, "Severe": 6, "Moderate": 3, "Minor": 0, None: 4}
+# Near the end of a rate-limit window, requests at or after this priority leave the last
+# few requests/tokens for urgent work
+RESERVED_FROM_PRIORITY = 30
+RESERVE_REQUESTS = 2
+RESERVE_TOKENS = 4000
+
+RETRYABLE = (groq.RateLimitError, groq.InternalServerError, groq.APIConnectionError)
+
+_SEVERITY_WORDS = {"critical": "Critical", "severe": "Severe", "high": "Severe", "moderate": "Moderate",
+                   "medium": "Moderate", "minor": "Minor", "low": "Minor"}
+_SEVERITY_RE = re.compile(r"severity[^\n]*?\b(critical|severe|high|moderate|medium|minor|low)\b", re.IGNORECASE)
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def severity_of(analysis):
+    match = _SEVERITY_RE.search(analysis or "")
+    return _SEVERITY_WORDS[match.group(1).lower()] if match else None
+
+
+def priority_for(category, severity=None):
+    return CATEGORY_PRIORITY.get(category, 40) - SEVERITY_BOOST.get(severity, SEVERITY_BOOST[None])
+
+
+def estimate_tokens(prompt, images=0, max_tokens=1000):
+    # Rough budget: ~4 characters per token plus a flat cost per image and the reply cap
+    return len(prompt) // 4 + images * 1000 + max_tokens
+
+
+def _seconds(value):
+    # Groq reset headers look like "7.66s", "2m59.56s" or "120ms"
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = _DURATION_RE.findall(value)
+    return sum(float(n) * units[u] for n, u in parts) if parts else None
+
+
+def _header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class Scheduler:
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._remaining_requests = None
+        self._remaining_tokens = None
+        self._requests_reset_at = 0.0
+        self._tokens_reset_at = 0.0
+        self._blocked_until = 0.0
+
+    def _wait_reason(self, priority, cost, now):
+        # Seconds until this request may start (0 = now); None while only a slot is missing
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        reserve = priority >= RESERVED_FROM_PRIORITY
+        if self._remaining_requests is not None and now < self._requests_reset_at:
+            if self._remaining_requests <= (RESERVE_REQUESTS if reserve else 0):
+                return self._requests_reset_at - now
+        if self._remaining_tokens is not None and now < self._tokens_reset_at:
+            if self._remaining_tokens < cost + (RESERVE_TOKENS if reserve else 0):
+                return self._tokens_reset_at - now
+        if self._in_flight >= self.max_in_flight:
+            return None
+        return 0
+
+    def _acquire(self, priority, cost, deadline):
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_reason(priority, cost, now) if self._waiting[0] == entry else None
+                    if wait == 0:
+                        heapq.heappop(self._waiting)
+                        self._in_flight += 1
+                        if self._remaining_requests is not None:
+                            self._remaining_requests -= 1
+                        if self._remaining_tokens is not None:
+                            self._remaining_tokens -= cost
+                        return
+                    if now >= deadline:
+                        raise DeadlineExceeded("Timed out waiting for model capacity")
+                    self._cond.wait(min(wait or deadline - now, deadline - now))
+            except BaseException:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                raise
+            finally:
+                self._cond.notify_all()
+
+    def _release(self, headers=None, retry_after=None):
+        now = time.monotonic()
+        with self._cond:
+            self._in_flight -= 1
+            if headers is not None:
+                requests = _header_int(headers, "x-ratelimit-remaining-requests")
+                tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+                if requests is not None:
+                    self._remaining_requests = requests
+                    self._requests_reset_at = now + (_seconds(headers.get("x-ratelimit-reset-requests")) or 0)
+                if tokens is not None:
+                    self._remaining_tokens = tokens
+                    self._tokens_reset_at = now + (_seconds(headers.get("x-ratelimit-reset-tokens")) or 0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            self._cond.notify_all()
+
+    def call(self, send, priority, cost, deadline_seconds=DEADLINE_SECONDS):
+        # `send` returns a raw SDK response; it is parsed once the rate-limit headers are read.
+        # Throttling and transient failures are retried with full-jitter backoff until the deadline.
+        deadline = time.monotonic() + deadline_seconds
+        for attempt in itertools.count():
+            queued_at = time.perf_counter()
+            self._acquire(priority, cost, deadline)
+            observe("scheduler_wait", time.perf_counter() - queued_at)
+            try:
+                raw = send()
+            except RETRYABLE as e:
+                response = getattr(e, "response", None)
+                retry_after = _seconds(response.headers.get("retry-after")) if response is not None else None
+                self._release(response.headers if response is not None else None, retry_after)
+                delay = retry_after or random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                if time.monotonic() + delay >= deadline:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self._release()
+                raise
+            self._release(raw.headers)
+            return raw.parse()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "waiting": len(self._waiting),
+                "in_flight": self._in_flight,
+                "remaining_requests": self._remaining_requests,
+                "remaining_tokens": self._remaining_tokens,
+            }
+
+
+scheduler = Scheduler()
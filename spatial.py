@@ -0,0 +1,59 @@
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_xyz(lat, lon):
+    # Points on the unit sphere: straight-line (chord) distance orders points exactly
+    # like great-circle distance, so a plain 3-D KD-tree gives correct nearest neighbours
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    return chord_to_km(math.dist(to_xyz(lat1, lon1), to_xyz(lat2, lon2)))
+
+
+class KDTree:
+    # Static 3-D tree over (lat, lon) points, built once. Nodes are (index, axis, left, right).
+    def __init__(self, coords):
+        self.points = [to_xyz(lat, lon) for lat, lon in coords]
+        self.root = self._build(list(range(len(self.points))), 0)
+
+    def _build(self, indexes, depth):
+        if not indexes:
+            return None
+        axis = depth % 3
+        indexes.sort(key=lambda i: self.points[i][axis])
+        mid = len(indexes) // 2
+        return (indexes[mid], axis, self._build(indexes[:mid], depth + 1), self._build(indexes[mid + 1:], depth + 1))
+
+    def nearest(self, lat, lon, k=1, accept=None):
+        # Returns [(distance_km, index)] for the k closest points for which accept(index) is true
+        target = to_xyz(lat, lon)
+        best = []  # max-heap of (-chord, index)
+
+        def visit(node):
+            if node is None:
+                return
+            index, axis, left, right = node
+            diff = target[axis] - self.points[index][axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if accept is None or accept(index):
+                chord = math.dist(target, self.points[index])
+                if len(best) < k:
+                    heapq.heappush(best, (-chord, index))
+                elif chord < -best[0][0]:
+                    heapq.heapreplace(best, (-chord, index))
+            # The far side can only hold closer points if the splitting plane is within reach
+            if len(best) < k or abs(diff) < -best[0][0]:
+                visit(far)
+
+        visit(self.root)
+        return [(chord_to_km(-chord), index) for chord, index in sorted(best, reverse=True)]
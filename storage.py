@@ -0,0 +1,550 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("PAWALERT_DATA_DIR", os.path.join(APP_DIR, "data"))
+DB_PATH = os.path.join(DATA_DIR, "pawalert.db")
+# Identifies this process in the change log; replicas skip their own entries
+REPLICA_ID = os.environ.get("PAWALERT_REPLICA_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    animal_type TEXT NOT NULL,
+    abuse_type TEXT,
+    location TEXT NOT NULL,
+    description TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    status TEXT NOT NULL,
+    analysis TEXT,
+    culprit_photo TEXT,
+    latitude REAL,
+    longitude REAL,
+    version INTEGER NOT NULL DEFAULT 0,
+    analysis_owner TEXT,
+    analysis_claimed_at REAL,
+    analysis_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_cases_type ON cases(type);
+CREATE INDEX IF NOT EXISTS idx_cases_status ON cases(status);
+CREATE INDEX IF NOT EXISTS idx_cases_location ON cases(location);
+CREATE INDEX IF NOT EXISTS idx_cases_timestamp ON cases(timestamp);
+
+CREATE TABLE IF NOT EXISTS hospitals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_id TEXT NOT NULL REFERENCES cases(id),
+    name TEXT NOT NULL,
+    location TEXT,
+    availability TEXT,
+    contact TEXT,
+    fees TEXT,
+    speciality TEXT,
+    facility_id INTEGER,
+    distance_km REAL
+);
+CREATE INDEX IF NOT EXISTS idx_hospitals_case ON hospitals(case_id);
+
+CREATE TABLE IF NOT EXISTS dispatches (
+    case_id TEXT PRIMARY KEY REFERENCES cases(id),
+    hospital_id INTEGER NOT NULL REFERENCES hospitals(id),
+    driver_name TEXT,
+    driver_contact TEXT,
+    message TEXT,
+    dispatched_at TEXT NOT NULL,
+    vehicle_id INTEGER,
+    eta_minutes INTEGER,
+    released_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS firs (
+    fir_number TEXT PRIMARY KEY,
+    case_id TEXT NOT NULL UNIQUE REFERENCES cases(id),
+    police_notified INTEGER NOT NULL DEFAULT 0,
+    message TEXT,
+    filed_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS evidence (
+    case_id TEXT NOT NULL REFERENCES cases(id),
+    kind TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (case_id, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_evidence_sha ON evidence(sha256);
+
+CREATE TABLE IF NOT EXISTS case_hashes (
+    case_id TEXT PRIMARY KEY REFERENCES cases(id),
+    type TEXT NOT NULL,
+    location TEXT NOT NULL,
+    animal_type TEXT NOT NULL,
+    phash TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_case_hashes_created ON case_hashes(created_at);
+
+CREATE TABLE IF NOT EXISTS linked_reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_id TEXT NOT NULL REFERENCES cases(id),
+    description TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    image_sha TEXT,
+    culprit_sha TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_linked_reports_case ON linked_reports(case_id);
+
+CREATE TABLE IF NOT EXISTS case_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    case_id TEXT REFERENCES cases(id),
+    linked INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys(created_at);
+
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    case_id TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# Case and FIR numbers: (sequence, first value, query for the highest number already issued)
+SEQUENCES = (
+    ("injury", 1001, "SELECT MAX(CAST(SUBSTR(id, 4) AS INTEGER)) FROM cases WHERE id LIKE 'INJ%'"),
+    ("abuse", 2001, "SELECT MAX(CAST(SUBSTR(id, 4) AS INTEGER)) FROM cases WHERE id LIKE 'ABU%'"),
+    ("fir", 5001, "SELECT MAX(CAST(SUBSTR(fir_number, 14) AS INTEGER)) FROM firs"),
+)
+CHANGE_RETENTION_SECONDS = 24 * 3600
+IDEMPOTENCY_RETENTION_SECONDS = 24 * 3600
+# A claim with no case after this long belongs to a request that died; the next retry takes it over
+IDEMPOTENCY_CLAIM_SECONDS = 300
+# Likewise for an analysis claimed by a process that stopped before storing a result or an error
+ANALYSIS_CLAIM_SECONDS = 300
+
+CASE_COLUMNS = (
+    "id", "type", "animal_type", "abuse_type", "location", "description",
+    "timestamp", "status", "analysis", "culprit_photo", "latitude", "longitude",
+)
+HOSPITAL_COLUMNS = ("name", "location", "availability", "contact", "fees", "speciality", "facility_id", "distance_km")
+
+# Columns added after the first release; CREATE TABLE IF NOT EXISTS won't add them to old databases
+ADDED_COLUMNS = (
+    ("cases", "latitude", "REAL"),
+    ("cases", "longitude", "REAL"),
+    ("hospitals", "facility_id", "INTEGER"),
+    ("hospitals", "distance_km", "REAL"),
+    ("dispatches", "vehicle_id", "INTEGER"),
+    ("dispatches", "eta_minutes", "INTEGER"),
+    ("dispatches", "released_at", "TEXT"),
+    ("cases", "version", "INTEGER NOT NULL DEFAULT 0"),
+    ("cases", "analysis_owner", "TEXT"),
+    ("cases", "analysis_claimed_at", "REAL"),
+    ("cases", "analysis_error", "TEXT"),
+)
+
+# Indexes over added columns, created once those columns exist
+POST_MIGRATION = """
+-- A vehicle can be on at most one open dispatch, across every process sharing the database
+CREATE UNIQUE INDEX IF NOT EXISTS idx_dispatches_active_vehicle
+    ON dispatches(vehicle_id) WHERE released_at IS NULL AND vehicle_id IS NOT NULL;
+"""
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _connect():
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    with _schema_lock:
+        if not _schema_ready:
+            conn.executescript(SCHEMA)
+            _add_columns(conn)
+            conn.executescript(POST_MIGRATION)
+            _rebuild_counters(conn)
+            _seed_sequences(conn)
+            _schema_ready = True
+    _local.conn = conn
+    return conn
+
+
+@contextmanager
+def _transaction(conn=None):
+    # BEGIN IMMEDIATE takes the write lock up front. A deferred transaction that reads and then
+    # writes fails with "database is locked" if another process committed in between.
+    conn = conn or _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    with conn:
+        yield conn
+
+
+def _add_columns(conn):
+    for table, column, decl in ADDED_COLUMNS:
+        if column not in {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}:
+            try:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+            except sqlite3.OperationalError as e:
+                # Another process starting at the same time added it first
+                if "duplicate column" not in str(e):
+                    raise
+
+
+def _rebuild_counters(conn):
+    # Counters are maintained incrementally; this only backfills a database created before them
+    with _transaction(conn):
+        if conn.execute("SELECT 1 FROM case_counters LIMIT 1").fetchone():
+            return
+        conn.execute("INSERT INTO case_counters VALUES ('total', (SELECT COUNT(*) FROM cases))")
+        conn.execute("INSERT INTO case_counters SELECT 'type:' || type, COUNT(*) FROM cases GROUP BY type")
+        conn.execute("INSERT INTO case_counters SELECT 'status:' || status, COUNT(*) FROM cases GROUP BY status")
+
+
+def _seed_sequences(conn):
+    # Sequences continue after the highest number in the database, so ids never repeat across an upgrade
+    with _transaction(conn):
+        for name, first, highest in SEQUENCES:
+            conn.execute(
+                f"INSERT OR IGNORE INTO sequences (name, value) VALUES (?, MAX(?, COALESCE(({highest}), 0)))",
+                (name, first - 1),
+            )
+
+
+def next_sequence(name):
+    # Atomic across every process sharing the database
+    with _transaction() as conn:
+        return conn.execute("UPDATE sequences SET value = value + 1 WHERE name = ? RETURNING value", (name,)).fetchone()[0]
+
+
+def _record(conn, kind, case_id):
+    # Every change bumps the case version, which keys its rendered fragments
+    conn.execute("UPDATE cases SET version = version + 1 WHERE id = ?", (case_id,))
+    conn.execute(
+        "INSERT INTO changes (kind, case_id, origin, created_at) VALUES (?, ?, ?, ?)",
+        (kind, case_id, REPLICA_ID, time.time()),
+    )
+
+
+def changes_since(seq, limit=500):
+    return _connect().execute("SELECT * FROM changes WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)).fetchall()
+
+
+def latest_change():
+    return _connect().execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+
+def prune_changes():
+    with _transaction() as conn:
+        conn.execute("DELETE FROM changes WHERE created_at < ?", (time.time() - CHANGE_RETENTION_SECONDS,))
+
+
+def _bump(conn, name, delta):
+    conn.execute(
+        "INSERT INTO case_counters (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, delta),
+    )
+
+
+def _set_status(conn, case_id, status):
+    row = conn.execute("SELECT status FROM cases WHERE id = ?", (case_id,)).fetchone()
+    if not row or row["status"] == status:
+        return
+    conn.execute("UPDATE cases SET status = ? WHERE id = ?", (status, case_id))
+    _bump(conn, f"status:{row['status']}", -1)
+    _bump(conn, f"status:{status}", 1)
+
+
+def _insert_hospitals(conn, case_id, hospitals):
+    conn.executemany(
+        f"INSERT INTO hospitals (case_id, {', '.join(HOSPITAL_COLUMNS)}) VALUES (?, {', '.join('?' * len(HOSPITAL_COLUMNS))})",
+        [[case_id] + [h.get(col) for col in HOSPITAL_COLUMNS] for h in hospitals],
+    )
+
+
+def create_case(case, hospitals=(), evidence=None, phash=None):
+    # `evidence` maps kind -> blob hash; payloads live in the blob store, never in the case row.
+    # `phash` is a (hex hash, epoch seconds) pair recorded for duplicate detection.
+    evidence = {kind: sha for kind, sha in (evidence or {}).items() if sha}
+    with _transaction() as conn:
+        conn.execute(
+            f"INSERT INTO cases ({', '.join(CASE_COLUMNS)}) VALUES ({', '.join('?' * len(CASE_COLUMNS))})",
+            [case.get(col) for col in CASE_COLUMNS],
+        )
+        _insert_hospitals(conn, case["id"], hospitals)
+        if case.get("fir_number"):
+            conn.execute(
+                "INSERT INTO firs (fir_number, case_id) VALUES (?, ?)",
+                (case["fir_number"], case["id"]),
+            )
+        conn.executemany(
+            "INSERT INTO evidence (case_id, kind, sha256) VALUES (?, ?, ?)",
+            [(case["id"], kind, sha) for kind, sha in evidence.items()],
+        )
+        if phash:
+            conn.execute(
+                "INSERT INTO case_hashes (case_id, type, location, animal_type, phash, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (case["id"], case["type"], case["location"], case["animal_type"], phash[0], phash[1]),
+            )
+        _bump(conn, "total", 1)
+        _bump(conn, f"type:{case['type']}", 1)
+        _bump(conn, f"status:{case['status']}", 1)
+        _record(conn, "created", case["id"])
+    return case["id"]
+
+
+def _assemble(conn, row):
+    case = dict(row)
+    if case["type"] == "Injury":
+        hospitals = conn.execute(
+            f"SELECT id, {', '.join(HOSPITAL_COLUMNS)} FROM hospitals WHERE case_id = ? ORDER BY id",
+            (case["id"],),
+        ).fetchall()
+        case["hospitals"] = [dict(h) for h in hospitals]
+        case["selected_hospital"] = None
+        dispatch = conn.execute("SELECT * FROM dispatches WHERE case_id = ?", (case["id"],)).fetchone()
+        if dispatch:
+            case["selected_hospital"] = next((h for h in case["hospitals"] if h["id"] == dispatch["hospital_id"]), None)
+            case["driver_name"] = dispatch["driver_name"]
+            case["driver_contact"] = dispatch["driver_contact"]
+            case["dispatch_message"] = dispatch["message"]
+            case["vehicle_id"] = dispatch["vehicle_id"]
+            case["eta_minutes"] = dispatch["eta_minutes"]
+            case["released_at"] = dispatch["released_at"]
+    else:
+        fir = conn.execute("SELECT * FROM firs WHERE case_id = ?", (case["id"],)).fetchone()
+        if fir:
+            case["fir_number"] = fir["fir_number"]
+            case["police_notified"] = bool(fir["police_notified"])
+            case["police_message"] = fir["message"]
+    case["linked_reports"] = conn.execute(
+        "SELECT COUNT(*) FROM linked_reports WHERE case_id = ?", (case["id"],)
+    ).fetchone()[0]
+    case["evidence"] = {
+        r["kind"]: r["sha256"]
+        for r in conn.execute("SELECT kind, sha256 FROM evidence WHERE case_id = ?", (case["id"],))
+    }
+    return case
+
+
+def get_case(case_id):
+    conn = _connect()
+    row = conn.execute("SELECT * FROM cases WHERE id = ?", (case_id,)).fetchone()
+    return _assemble(conn, row) if row else None
+
+
+def list_cases(case_type=None, limit=None, offset=0):
+    conn = _connect()
+    query = "SELECT * FROM cases"
+    params = []
+    if case_type:
+        query += " WHERE type = ?"
+        params.append(case_type)
+    query += " ORDER BY timestamp DESC, rowid DESC"
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+    return [_assemble(conn, row) for row in conn.execute(query, params).fetchall()]
+
+
+def list_case_summaries(case_type=None, limit=None, offset=0):
+    # Row-only view for list screens: no hospital, dispatch or FIR lookups
+    query = (
+        "SELECT c.id, c.type, c.animal_type, c.location, c.timestamp, c.status, c.version, e.sha256 AS icon_sha "
+        "FROM cases c LEFT JOIN evidence e ON e.case_id = c.id AND e.kind = 'image_icon'"
+    )
+    params = []
+    if case_type:
+        query += " WHERE c.type = ?"
+        params.append(case_type)
+    query += " ORDER BY c.timestamp DESC, c.rowid DESC"
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+    return [dict(row) for row in _connect().execute(query, params).fetchall()]
+
+
+def recent_case_hashes(since, after_rowid=0):
+    # Rows are only ever appended, so rowid doubles as a cursor for catching up
+    return _connect().execute(
+        "SELECT rowid, * FROM case_hashes WHERE rowid > ? AND created_at >= ? ORDER BY rowid", (after_rowid, since)
+    ).fetchall()
+
+
+def link_report(case_id, description, timestamp, evidence):
+    # A witness report folded into an existing case; it gets no id, analysis or counters of its own
+    with _transaction() as conn:
+        conn.execute(
+            "INSERT INTO linked_reports (case_id, description, timestamp, image_sha, culprit_sha) VALUES (?, ?, ?, ?, ?)",
+            (case_id, description, timestamp, evidence.get("image"), evidence.get("culprit")),
+        )
+        _record(conn, "linked", case_id)
+
+
+def _counter(name):
+    row = _connect().execute("SELECT value FROM case_counters WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def count_cases(case_type=None):
+    return _counter(f"type:{case_type}" if case_type else "total")
+
+
+def count_by_status(status):
+    return _counter(f"status:{status}")
+
+
+def dispatch_ambulance(case_id, hospital_id, driver_name, driver_contact, dispatched_at, vehicle_id=None,
+                       eta_minutes=None):
+    # Raises sqlite3.IntegrityError if the case is already dispatched or the vehicle is booked elsewhere
+    with _transaction() as conn:
+        conn.execute(
+            "INSERT INTO dispatches (case_id, hospital_id, driver_name, driver_contact, dispatched_at, vehicle_id, eta_minutes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (case_id, hospital_id, driver_name, driver_contact, dispatched_at, vehicle_id, eta_minutes),
+        )
+        _set_status(conn, case_id, "Ambulance Dispatched")
+        _record(conn, "dispatched", case_id)
+
+
+def close_case(case_id, closed_at):
+    # Releases the case's vehicle (if any) and returns its id
+    with _transaction() as conn:
+        row = conn.execute(
+            "SELECT vehicle_id FROM dispatches WHERE case_id = ? AND released_at IS NULL", (case_id,)
+        ).fetchone()
+        conn.execute("UPDATE dispatches SET released_at = ? WHERE case_id = ? AND released_at IS NULL", (closed_at, case_id))
+        _set_status(conn, case_id, "Case Closed")
+        _record(conn, "closed", case_id)
+    return row["vehicle_id"] if row else None
+
+
+def active_vehicle_assignments():
+    rows = _connect().execute(
+        "SELECT vehicle_id, case_id FROM dispatches WHERE released_at IS NULL AND vehicle_id IS NOT NULL"
+    ).fetchall()
+    return {row["vehicle_id"]: row["case_id"] for row in rows}
+
+
+def claim_analysis(case_id):
+    # True once this process owns the case's analysis, so no other process or replica starts
+    # the same one. Clears the error of an earlier failed attempt.
+    now = time.time()
+    with _transaction() as conn:
+        claimed = conn.execute(
+            "UPDATE cases SET analysis_owner = ?, analysis_claimed_at = ?, analysis_error = NULL "
+            "WHERE id = ? AND analysis IS NULL "
+            "AND (analysis_owner IS NULL OR analysis_owner = ? OR analysis_claimed_at < ?)",
+            (REPLICA_ID, now, case_id, REPLICA_ID, now - ANALYSIS_CLAIM_SECONDS),
+        ).rowcount
+        if claimed:
+            _record(conn, "analysis_started", case_id)
+    return bool(claimed)
+
+
+def unanalysed_cases():
+    # Cases without an analysis, an error or a live claim by another process, oldest first
+    return [row["id"] for row in _connect().execute(
+        "SELECT id FROM cases WHERE analysis IS NULL AND analysis_error IS NULL "
+        "AND (analysis_owner IS NULL OR analysis_owner = ? OR analysis_claimed_at < ?) ORDER BY timestamp",
+        (REPLICA_ID, time.time() - ANALYSIS_CLAIM_SECONDS),
+    )]
+
+
+def set_analysis(case_id, analysis):
+    with _transaction() as conn:
+        conn.execute("UPDATE cases SET analysis = ?, analysis_owner = NULL, analysis_error = NULL WHERE id = ?",
+                     (analysis, case_id))
+        _record(conn, "analysis", case_id)
+
+
+def fail_analysis(case_id, error):
+    # Kept until a retry claims the case, so every process reports the failure
+    with _transaction() as conn:
+        conn.execute("UPDATE cases SET analysis_owner = NULL, analysis_error = ? WHERE id = ? AND analysis IS NULL",
+                     (error, case_id))
+        _record(conn, "analysis_failed", case_id)
+
+
+def set_hospitals(case_id, hospitals, replace=False):
+    # Only fills in a case without recommendations, unless replace=True. Once an ambulance is
+    # dispatched to one of them the list is kept either way.
+    with _transaction() as conn:
+        if conn.execute("SELECT 1 FROM hospitals WHERE case_id = ? LIMIT 1", (case_id,)).fetchone():
+            if not replace or conn.execute("SELECT 1 FROM dispatches WHERE case_id = ?", (case_id,)).fetchone():
+                return
+            conn.execute("DELETE FROM hospitals WHERE case_id = ?", (case_id,))
+        _insert_hospitals(conn, case_id, hospitals)
+        _record(conn, "hospitals", case_id)
+
+
+def set_dispatch_message(case_id, message):
+    with _transaction() as conn:
+        conn.execute("UPDATE dispatches SET message = ? WHERE case_id = ?", (message, case_id))
+        _record(conn, "dispatch_message", case_id)
+
+
+def notify_police(case_id, filed_at):
+    with _transaction() as conn:
+        conn.execute("UPDATE firs SET police_notified = 1, filed_at = ? WHERE case_id = ?", (filed_at, case_id))
+        _set_status(conn, case_id, "Police Notified - FIR Filed")
+        _record(conn, "police", case_id)
+
+
+def set_police_message(case_id, message):
+    with _transaction() as conn:
+        conn.execute("UPDATE firs SET message = ? WHERE case_id = ?", (message, case_id))
+        _record(conn, "police_message", case_id)
+
+
+def claim_idempotency_key(key, fingerprint):
+    # Returns None once the caller owns the key, otherwise the stored row. Its case_id is
+    # None while the request that claimed it is still registering the case.
+    now = time.time()
+    with _transaction() as conn:
+        conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (now - IDEMPOTENCY_RETENTION_SECONDS,))
+        row = conn.execute("SELECT * FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+        if row is not None and (row["case_id"] or row["created_at"] > now - IDEMPOTENCY_CLAIM_SECONDS):
+            return dict(row)
+        conn.execute(
+            "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, created_at) VALUES (?, ?, ?)",
+            (key, fingerprint, now),
+        )
+    return None
+
+
+def complete_idempotency_key(key, case_id, linked):
+    with _transaction() as conn:
+        conn.execute("UPDATE idempotency_keys SET case_id = ?, linked = ? WHERE key = ?", (case_id, int(linked), key))
+
+
+def release_idempotency_key(key):
+    # The request failed before creating a case, so a retry may start over
+    with _transaction() as conn:
+        conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND case_id IS NULL", (key,))
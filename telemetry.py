@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prometheus-style histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Recent samples kept per series for the admin page's percentiles
+SAMPLE_WINDOW = 1024
+
+TRACE_LOG = os.environ.get("PAWALERT_TRACE_LOG") == "1"
+METRICS_PORT = int(os.environ.get("PAWALERT_METRICS_PORT", "0"))
+
+logger = logging.getLogger("pawalert.telemetry")
+if TRACE_LOG and not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_server = None
+_server_failed = False
+
+
+def _series(name, tags):
+    return name, tuple(sorted((k, str(v)) for k, v in tags.items()))
+
+
+def observe(name, seconds, **tags):
+    key = _series(name, tags)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS),
+                                       "recent": deque(maxlen=SAMPLE_WINDOW)}
+        hist["count"] += 1
+        hist["sum"] += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+        hist["recent"].append(seconds)
+
+
+def count(name, value=1, **tags):
+    key = _series(name, tags)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+@contextmanager
+def span(name, **tags):
+    # Times the block into the `name` histogram. Tags may be filled in inside the block
+    # (e.g. token counts); an escaping exception tags the span outcome=error.
+    tags.setdefault("outcome", "ok")
+    start = time.perf_counter()
+    try:
+        yield tags
+    except Exception:
+        tags["outcome"] = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        # Numeric tags are measurements, not labels; they go to the log only
+        labels = {k: v for k, v in tags.items() if not isinstance(v, (int, float)) or isinstance(v, bool)}
+        observe(name, elapsed, **labels)
+        if TRACE_LOG:
+            logger.info(json.dumps({"span": name, "ms": round(elapsed * 1000, 2), "ts": time.time(), **tags},
+                                   default=str))
+
+
+def log_event(name, **fields):
+    # One-off decisions worth keeping next to the spans in the trace log
+    if TRACE_LOG:
+        logger.info(json.dumps({"event": name, "ts": time.time(), **fields}, default=str))
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def latency_summary():
+    with _lock:
+        snapshot = [(name, dict(labels), list(h["recent"]), h["count"]) for (name, labels), h in _histograms.items()]
+    return sorted(
+        ({"span": name, "labels": labels, "count": total,
+          "p50_ms": round(_percentile(samples, 0.5) * 1000, 1),
+          "p95_ms": round(_percentile(samples, 0.95) * 1000, 1)}
+         for name, labels, samples, total in snapshot if samples),
+        key=lambda row: (row["span"], sorted(row["labels"].items())),
+    )
+
+
+def counter_values():
+    with _lock:
+        return [{"counter": name, "labels": dict(labels), "value": value} for (name, labels), value in _counters.items()]
+
+
+def _metric_name(name):
+    return "pawalert_" + name.replace(".", "_")
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+    seen = set()
+    for (name, labels), hist in histograms:
+        metric = _metric_name(name) + "_seconds"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} histogram")
+            seen.add(metric)
+        for bound, value in zip(BUCKETS, hist["buckets"]):
+            lines.append(f"{metric}_bucket{_labels(labels, [('le', bound)])} {value}")
+        lines.append(f"{metric}_bucket{_labels(labels, [('le', '+Inf')])} {hist['count']}")
+        lines.append(f"{metric}_sum{_labels(labels)} {hist['sum']:.6f}")
+        lines.append(f"{metric}_count{_labels(labels)} {hist['count']}")
+    for (name, labels), value in counters:
+        metric = _metric_name(name) + "_total"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} counter")
+            seen.add(metric)
+        lines.append(f"{metric}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT):
+    # Serves /metrics on localhost; a no-op when no port is configured, it is already running,
+    # or the port could not be bound (logged once, e.g. another replica holds it)
+    global _server, _server_failed
+    if not port:
+        return None
+    with _lock:
+        if _server is None and not _server_failed:
+            try:
+                _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+            except OSError as e:
+                _server_failed = True
+                logger.warning("metrics server not started on port %s: %s", port, e)
+                return None
+            threading.Thread(target=_server.serve_forever, name="pawalert-metrics", daemon=True).start()
+    return _server
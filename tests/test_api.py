@@ -0,0 +1,152 @@
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import uuid
+
+os.environ["PAWALERT_DATA_DIR"] = tempfile.mkdtemp(prefix="pawalert-test-")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bench")]
+
+from PIL import Image  # noqa: E402
+from tornado.testing import AsyncHTTPTestCase, gen_test  # noqa: E402
+
+import api  # noqa: E402
+import inference  # noqa: E402
+import jobs  # noqa: E402
+import pipeline  # noqa: E402
+from stub_client import StubClient  # noqa: E402
+
+inference._client = StubClient(first_token_latency=0)
+inference._client_key = "stub"
+
+REPORT = {"animal_type": "Dog", "location": "Connaught Place, Delhi", "description": "limping on the left foreleg"}
+
+
+def photo():
+    # Noise, so no two tests' photos are folded into the same case
+    buf = io.BytesIO()
+    Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, body) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: image/png\r\n\r\n'.encode() + body + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class APITest(AsyncHTTPTestCase):
+    token = None
+
+    def get_app(self):
+        return api.make_app(token=self.token)
+
+    def get_httpserver_options(self):
+        return api.server_options(max_body_mb=1)
+
+    def post(self, kind="injury", fields=REPORT, image=None, key=None, headers=None, **kwargs):
+        body, content_type = multipart(fields, {"image": ("photo.png", image or photo())})
+        headers = dict(headers or {}, **{"Content-Type": content_type})
+        if key:
+            headers["Idempotency-Key"] = key
+        return self.http_client.fetch(self.get_url(f"/api/reports/{kind}"), method="POST", body=body,
+                                      headers=headers, raise_error=False, **kwargs)
+
+    @gen_test
+    async def test_new_report_is_created_and_repeat_is_linked(self):
+        image = photo()
+        first = await self.post(image=image)
+        self.assertEqual(first.code, 201)
+        self.assertTrue(first.headers["Location"].startswith("/api/cases/INJ"))
+        second = await self.post(image=image)
+        self.assertEqual(second.code, 200)
+        self.assertTrue(json.loads(second.body)["linked"])
+
+    @gen_test
+    async def test_same_key_replays_the_original_case(self):
+        image = photo()
+        first = await self.post(image=image, key="replay")
+        replay = await self.post(image=image, key="replay")
+        self.assertEqual(first.code, 201)
+        self.assertEqual(replay.code, 200)
+        self.assertEqual(replay.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(json.loads(replay.body)["case_id"], json.loads(first.body)["case_id"])
+
+    @gen_test
+    async def test_reused_key_with_a_different_report_is_rejected(self):
+        image = photo()
+        self.assertEqual((await self.post(image=image, key="reused")).code, 201)
+        other = await self.post(image=image, key="reused", fields=dict(REPORT, description="a different report"))
+        self.assertEqual(other.code, 422)
+
+    @gen_test
+    async def test_key_in_flight_answers_409(self):
+        entered, release = threading.Event(), threading.Event()
+        register_report = api.register_report
+
+        def slow_register(*args):
+            entered.set()
+            release.wait(10)
+            return register_report(*args)
+
+        api.register_report = slow_register
+        try:
+            image = photo()
+            first = self.post(image=image, key="in-flight")
+            while not entered.is_set():
+                await asyncio.sleep(0.01)
+            second = await self.post(image=image, key="in-flight")
+            self.assertEqual(second.code, 409)
+            self.assertEqual(second.headers["Retry-After"], "1")
+        finally:
+            release.set()
+            api.register_report = register_report
+        self.assertEqual((await first).code, 201)
+
+    @gen_test
+    async def test_failed_analysis_outlives_the_job(self):
+        def failing(*args, **kwargs):
+            raise RuntimeError("model unavailable")
+            yield
+
+        stream_completion, pipeline.stream_completion = pipeline.stream_completion, failing
+        try:
+            case_url = (await self.post()).headers["Location"]
+            for _ in range(100):
+                case = json.loads((await self.http_client.fetch(self.get_url(case_url))).body)
+                if case["analysis_state"] != "pending":
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            pipeline.stream_completion = stream_completion
+        self.assertEqual(case["analysis_state"], "failed")
+        # A restarted process has no job table; the failure is read from the case
+        jobs._jobs.clear()
+        case = json.loads((await self.http_client.fetch(self.get_url(case_url))).body)
+        self.assertEqual(case["analysis_state"], "failed")
+
+    @gen_test
+    async def test_oversize_body_is_refused(self):
+        response = await self.post(image=os.urandom(2 * 1024 * 1024))
+        self.assertEqual(response.code, 400)
+
+
+class TokenTest(AsyncHTTPTestCase):
+    def get_app(self):
+        return api.make_app(token="s3cret")
+
+    def test_token_is_required(self):
+        self.assertEqual(self.fetch("/api/cases/INJ1").code, 401)
+        self.assertEqual(self.fetch("/api/cases/INJ1", headers={"Authorization": "Bearer wrong"}).code, 401)
+        self.assertEqual(self.fetch("/api/cases/INJ1", headers={"Authorization": "Bearer s3cret"}).code, 404)
+        self.assertEqual(self.fetch("/api/health").code, 200)